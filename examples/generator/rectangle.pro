@@ -0,0 +1,33 @@
+input = "rectangle.dat";
+
+mesh =
+{
+  type      = "quad4";
+  group     = "rectangle";
+  divisions = [100, 100];
+  size      = [10.0, 10.0];
+};
+
+rectangle =
+{
+  type = "SmallStrainContinuum";
+
+  material =
+  {
+    type = "PlaneStrain";
+    E    = 1.e5;
+    nu   = 0.25;
+  };
+};
+
+solver =
+{
+  type     = "LinearSolver";
+};
+
+outputModules = ["vtk"];
+
+vtk =
+{
+  type = "MeshWriter";
+};
@@ -9,23 +9,33 @@ from pyfem.io.input import input_reader
 from pyfem.io.OutputManager import OutputManager
 from pyfem.solvers.Solver import Solver
 
-t1 = time.time()
 
-props, globdat = input_reader()
+def main():
+    t1 = time.time()
 
-# print(props)
-# print(type(globdat))
-#
-solver = Solver(props, globdat)
-output = OutputManager(props, globdat)
+    props, globdat = input_reader()
 
-while globdat.active:
-    solver.run(props, globdat)
-    output.run(props, globdat)
+    # print(props)
+    # print(type(globdat))
+    #
+    solver = Solver(props, globdat)
+    output = OutputManager(props, globdat)
 
-t2 = time.time()
+    while globdat.active:
+        solver.run(props, globdat)
+        output.run(props, globdat)
 
-total = t2 - t1
-print("Time elapsed = ", total, " [s].\n")
+    globdat.elements.close()
 
-print("PyFem analysis terminated successfully.")
+    t2 = time.time()
+
+    total = t2 - t1
+    print("Time elapsed = ", total, " [s].\n")
+
+    print("PyFem analysis terminated successfully.")
+
+
+# The guard keeps the worker processes of a material pool, which import this module under the spawn start method,
+# from running the analysis
+if __name__ == "__main__":
+    main()
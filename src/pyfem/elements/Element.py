@@ -1,4 +1,4 @@
-from numpy import zeros
+from numpy import array
 
 from pyfem.materials.MaterialManager import MaterialManager
 
@@ -16,17 +16,29 @@ class Element(list):
         self.family = "CONTINUUM"
         self.history = {}
         self.current = {}
+        self.props = props
         self.solver_status = props.solver_status
 
-        for name, val in props:
-            if name == "material":
-                self.matProps = val
+        if hasattr(props, "material"):
+            self.matProps = props.material
 
-                self.matProps.rank = props.rank
-                self.matProps.solver_status = self.solver_status
-                self.mat = MaterialManager(self.matProps)
+            self.matProps.rank = props.rank
+            self.matProps.solver_status = self.solver_status
 
-            setattr(self, name, val)
+    def __getattr__(self, name):
+        # The material manager is created when the element evaluates its material for the first time, the elements
+        # of groups whose material points are evaluated at once never need one
+        if name == "mat" and "matProps" in self.__dict__:
+            self.mat = MaterialManager(self.matProps)
+            return self.mat
+
+        # The group properties are shared by all elements of a group instead of being copied to every element
+        props = self.__dict__.get("props")
+
+        if props is not None and hasattr(props, name):
+            return getattr(props, name)
+
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
 
 
 
@@ -46,26 +58,20 @@ class Element(list):
 
 
 
-    def appendNodalOutput(self, labels, data, weight=1.0):
+    def getOutputData(self):
+        """
+        Get the output of the material at the integration points of the last evaluation of the element, which the
+        nodal output of the writers is recovered from.
 
-        for i, name in enumerate(labels):
-            if not hasattr(self.globdat, name):
-                self.globdat.outputNames.append(name)
+        :return: the output labels and the (number_of_points, number_of_labels) array of output data, or an empty
+            list and None if the element has no material output
+        """
+        matlist = getattr(self.__dict__.get("mat"), "matlist", None)
 
-                setattr(self.globdat, name, zeros(len(self.globdat.nodes)))
-                setattr(self.globdat, name + 'Weights', zeros(len(self.globdat.nodes)))
+        if not matlist or not len(matlist[0].outLabels):
+            return [], None
 
-            outMat = getattr(self.globdat, name)
-            outWeights = getattr(self.globdat, name + 'Weights')
-
-            if data.ndim == 1:
-                for idx in self.globdat.nodes.get_indices_by_ids(self):
-                    outMat[idx] += data[i]
-                    outWeights[idx] += weight
-            else:
-                for j, idx in enumerate(self.globdat.nodes.get_indices_by_ids(self)):
-                    outMat[idx] += data[j, i]
-                    outWeights[idx] += weight
+        return matlist[0].outLabels, array([mat.outData for mat in matlist], dtype=float)
 
 
 
@@ -83,12 +89,9 @@ class Element(list):
         self.history = self.current.copy()
         self.current = {}
 
-        if hasattr(self, "mat"):
+        if "mat" in self.__dict__:
             self.mat.commit_history()
 
-    def commit(self, elemdat):
-        pass
-
     #
     #
     #
@@ -1,7 +1,8 @@
+import numpy as np
 from numpy import zeros, dot
 
-from pyfem.utils.kinematics import Kinematics
-from pyfem.utils.shape_functions import get_element_shape_data
+from pyfem.utils.kinematics import Kinematics, get_b_matrices, get_n_matrices
+from pyfem.utils.shape_functions import get_element_shape_data, get_stacked_shape_data
 from .Element import Element
 
 
@@ -28,56 +29,151 @@ class SmallStrainContinuum(Element):
 
     # ------------------------------------------------------------------------
 
-    def getTangentStiffness(self, elemdat):
+    def get_geometry(self, coords):
+        """
+        Compute the geometric data of a stack of elements, which ElementGroup caches for the small strain
+        analysis: the shape function derivatives, the weights and the B-matrices at the integration points.
 
-        shape_data = get_element_shape_data(elemdat.coords)
+        :param coords: the (number_of_elements, number_of_nodes, rank) array of element coordinates
+        :return: a dict with the stacked arrays dhdx, weights and b
+        """
+        _, dhdx, weights = get_stacked_shape_data(coords)
+
+        return {'dhdx': dhdx, 'weights': weights, 'b': get_b_matrices(dhdx)}
+
+    def get_constant_stiffness(self, geometry, elements, tangent):
+        """
+        Compute the stiffness matrices of a range of elements of a group for a constant tangent, e.g. the elastic
+        tangent of the material.
+
+        :param geometry: the ElementGeometry of the group
+        :param elements: the slice of element positions in the group
+        :param tangent: the constant tangent of the material
+        :return: the (number_of_elements, number_of_dofs, number_of_dofs) array of stiffness matrices
+        """
+        b = geometry.b[elements]
+        nElm, nDof = len(b), b.shape[-1]
+
+        wb = (b * geometry.weights[elements][:, :, np.newaxis, np.newaxis]).reshape(nElm, -1, nDof)
+
+        return np.swapaxes(wb, 1, 2) @ (tangent @ b).reshape(nElm, -1, nDof)
+
+    def get_constant_stresses(self, geometry, states, tangent):
+        """
+        Compute the stresses at the integration points of all elements of a group for a material with a constant
+        tangent.
+
+        :param geometry: the ElementGeometry of the group
+        :param states: the (number_of_elements, number_of_dofs) array of element states
+        :param tangent: the constant tangent of the material
+        :return: the (number_of_elements, number_of_points, number_of_strains) array of stresses
+        """
+        return np.einsum('eisd,ed->eis', geometry.b, states) @ tangent.T
+
+    def get_integration_data(self, elemdat):
+        # The B-matrices and the weights of the cached geometry of the group, or of the element coordinates
+        geometry = getattr(elemdat, 'geometry', None)
+
+        if geometry is not None:
+            return zip(geometry.b[elemdat.iElm], geometry.weights[elemdat.iElm])
+
+        return ((self.getBmatrix(iData.dhdx), iData.weight) for iData in get_element_shape_data(elemdat.coords))
+
+    def get_group_stresses(self, groupdat):
+        # The stresses and the tangents at all integration points of a range of elements of the group
+        b = groupdat.geometry.b[groupdat.elements]
+
+        strain = np.einsum('eisd,ed->eis', b, groupdat.state)
+        dstrain = np.einsum('eisd,ed->eis', b, groupdat.dstate)
+
+        sigma, tang = groupdat.points.getStresses(groupdat.elements, strain, dstrain)
+
+        return b, groupdat.geometry.weights[groupdat.elements], sigma, tang
+
+    # ------------------------------------------------------------------------
+
+    def getTangentStiffness(self, elemdat):
 
         elemdat.outlabel.append(self.outputLabels)
         elemdat.outdata = zeros(shape=(len(elemdat.nodes), self.nstr))
 
-        for iData in shape_data:
-            b = self.getBmatrix(iData.dhdx)
-
+        for b, weight in self.get_integration_data(elemdat):
             self.kin.strain = dot(b, elemdat.state)
             self.kin.dstrain = dot(b, elemdat.dstate)
 
             sigma, tang = self.mat.getStress(self.kin)
 
-            elemdat.stiff += dot(b.transpose(), dot(tang, b)) * iData.weight
-            elemdat.fint += dot(b.transpose(), sigma) * iData.weight
+            elemdat.stiff += dot(b.transpose(), dot(tang, b)) * weight
+            elemdat.fint += dot(b.transpose(), sigma) * weight
+
+    # -------------------------------------------------------------------------
+
+    def getGroupTangentStiffness(self, groupdat):
+
+        # The element stiffness matrices of a material with a constant tangent are precomputed
+        if groupdat.stiffness is not None and groupdat.points.tangent is not None:
+            groupdat.stiff = groupdat.stiffness[groupdat.elements]
+            groupdat.fint = (groupdat.stiff @ groupdat.state[:, :, np.newaxis])[:, :, 0]
+            groupdat.points.setStates(groupdat.elements, groupdat.state)
+            return
+
+        b, weights, sigma, tang = self.get_group_stresses(groupdat)
+
+        nElm, nDof = groupdat.fint.shape
 
-            self.appendNodalOutput(self.mat.outLabels(), self.mat.outData())
+        # The sums over the integration points and the strain components are one matrix product per element
+        wb = (b * weights[:, :, np.newaxis, np.newaxis]).reshape(nElm, -1, nDof)
+
+        groupdat.fint = np.einsum('ekd,ek->ed', wb, sigma.reshape(nElm, -1))
+
+        if groupdat.stiffness is None:
+            groupdat.stiff = np.swapaxes(wb, 1, 2) @ (tang @ b).reshape(nElm, -1, nDof)
+            return
+
+        # Only the active elements, which have points with another than the elastic tangent, need their stiffness
+        # matrices computed from the tangents
+        active = groupdat.points.active[groupdat.elements]
+
+        groupdat.stiff = groupdat.stiffness[groupdat.elements]
+
+        if active.any():
+            groupdat.stiff = groupdat.stiff.copy()
+            groupdat.stiff[active] = np.swapaxes(wb[active], 1, 2) @ \
+                (tang[active] @ b[active]).reshape(-1, wb.shape[1], nDof)
 
     # -------------------------------------------------------------------------
 
     def getInternalForce(self, elemdat):
 
-        shape_data = get_element_shape_data(elemdat.coords)
-
         elemdat.outlabel.append(self.outputLabels)
         elemdat.outdata = zeros(shape=(len(elemdat.nodes), self.nstr))
 
-        for iData in shape_data:
-            b = self.getBmatrix(iData.dhdx)
-
+        for b, weight in self.get_integration_data(elemdat):
             self.kin.strain = dot(b, elemdat.state)
             self.kin.dstrain = dot(b, elemdat.dstate)
 
             sigma, tang = self.mat.getStress(self.kin)
 
-            elemdat.fint += dot(b.transpose(), sigma) * iData.weight
+            elemdat.fint += dot(b.transpose(), sigma) * weight
 
-            self.appendNodalOutput(self.mat.outLabels(), self.mat.outData())
+    # -------------------------------------------------------------------------
 
-    # -------------------------------------------------------------------------------
+    def getGroupInternalForce(self, groupdat):
 
-    def getDissipation(self, elemdat):
+        if groupdat.stiffness is not None and groupdat.points.tangent is not None:
+            groupdat.fint = (groupdat.stiffness[groupdat.elements] @ groupdat.state[:, :, np.newaxis])[:, :, 0]
+            groupdat.points.setStates(groupdat.elements, groupdat.state)
+            return
 
-        shape_data = get_element_shape_data(elemdat.coords)
+        b, weights, sigma, tang = self.get_group_stresses(groupdat)
 
-        for iData in shape_data:
-            b = self.getBmatrix(iData.dhdx)
+        groupdat.fint = np.einsum('eisd,eis,ei->ed', b, sigma, weights)
 
+    # -------------------------------------------------------------------------------
+
+    def getDissipation(self, elemdat):
+
+        for b, weight in self.get_integration_data(elemdat):
             self.kin.strain = dot(b, elemdat.state)
             self.kin.dstrain = dot(b, elemdat.dstate)
 
@@ -86,8 +182,8 @@ class SmallStrainContinuum(Element):
             self.kin.dgdstrain = zeros(3)
             self.kin.g = 0.0
 
-            elemdat.fint += dot(b.transpose(), self.kin.dgdstrain) * iData.weight
-            elemdat.diss += self.kin.g * iData.weight
+            elemdat.fint += dot(b.transpose(), self.kin.dgdstrain) * weight
+            elemdat.diss += self.kin.g * weight
 
     
 
@@ -107,39 +203,10 @@ class SmallStrainContinuum(Element):
 
     def getBmatrix(self, dphi):
 
-        b = zeros(shape=(self.nstr, self.dofCount()))
-
-        if self.rank == 2:
-            for i, dp in enumerate(dphi):
-                b[0, i * 2 + 0] = dp[0]
-                b[1, i * 2 + 1] = dp[1]
-                b[2, i * 2 + 0] = dp[1]
-                b[2, i * 2 + 1] = dp[0]
-        elif self.rank == 3:
-            for i, dp in enumerate(dphi):
-                b[0, i * 3 + 0] = dp[0]
-                b[1, i * 3 + 1] = dp[1]
-                b[2, i * 3 + 2] = dp[2]
-
-                b[3, i * 3 + 1] = dp[2]
-                b[3, i * 3 + 2] = dp[1]
-
-                b[4, i * 3 + 0] = dp[2]
-                b[4, i * 3 + 2] = dp[0]
-
-                b[5, i * 3 + 0] = dp[1]
-                b[5, i * 3 + 1] = dp[0]
-
-        return b
+        return get_b_matrices(dphi)
 
     # ------------------------------------------------------------------------------
 
     def getNmatrix(self, h):
 
-        N = zeros(shape=(self.rank, self.rank * len(h)))
-
-        for i, a in enumerate(h):
-            for j in list(range(self.rank)):
-                N[j, self.rank * i + j] = a
-
-        return N
+        return get_n_matrices(h, self.rank)
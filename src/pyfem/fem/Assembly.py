@@ -1,23 +1,35 @@
-from numpy import zeros, ones, append, repeat, array
+import numpy as np
+from numpy import zeros, repeat, tile
 from scipy.sparse import coo_matrix
 
-from pyfem.utils.data_structures import ElementData
+from pyfem.utils.data_structures import ElementData, ElementGroupData
+from pyfem.utils.out_of_core import DEFAULT_MEMORY_BUDGET, get_chunk_size, iter_chunks
+
+# The group-level actions of the element kernels, which evaluate a range of elements of a group at once
+GROUP_ACTIONS = {'getTangentStiffness': 'getGroupTangentStiffness',
+                 'getInternalForce': 'getGroupInternalForce'}
 
 
 def assembleArray(props, globdat, rank, action):
     # Initialize the global array A with rank 2
 
-    B = zeros(globdat.dofs.get_number_of_dofs() * ones(1, dtype=int))
-    cc = 0.0
-
-    val = array([], dtype=float)
-    row = array([], dtype=int)
-    col = array([], dtype=int)
+    scratch = getattr(globdat, 'scratch', None)
+    memory_budget = DEFAULT_MEMORY_BUDGET if scratch is None else scratch.memory_budget
 
     nDof = globdat.dofs.get_number_of_dofs()
 
-    if action != 'commit':
-        globdat.reset_nodal_output()
+    B = zeros(nDof) if scratch is None else scratch.zeros(nDof)
+    cc = 0.0
+
+    # The triplets of all element matrices are written into preallocated arrays, in the order of the elements
+    if rank == 2:
+        count = sum(len(group) * (group.nodes_per_element * len(group.kernel.dof_types)) ** 2
+                    for group in globdat.elements.groups.values())
+        empty = np.empty if scratch is None else scratch.empty
+        val = empty(count, dtype=float)
+        row = empty(count, dtype=int)
+        col = empty(count, dtype=int)
+    position = 0
 
     # Loop over the element groups
     for elementGroup in globdat.elements.iter_group_names():
@@ -25,79 +37,133 @@ def assembleArray(props, globdat, rank, action):
         # Get the properties corresponding to the elementGroup
         el_props = getattr(props, elementGroup)
 
-        # Loop over the elements in the elementGroup
-        for iElm, element in enumerate(globdat.elements.iter_element_group(elementGroup)):
-
-            # Get the element nodes
-            el_nodes = element.getNodes()
-
-            # Get the element coordinates
-            el_coords = globdat.nodes.get_node_coords(el_nodes)
-
-            # Get the element degrees of freedom
-            el_dofs = globdat.dofs.get_dof_ids_by_types(el_nodes, element.dof_types)
-
-            # Get the element state
-            el_a = globdat.state[el_dofs]
-            el_Da = globdat.dstate[el_dofs]
-
-            # Create the an element state to pass through to the element
-            # el_state = Properties( { 'state' : el_a, 'dstate' : el_Da } )
-            elemdat = ElementData(el_a, el_Da)
-
-            elemdat.coords = el_coords
-            elemdat.nodes = el_nodes
-            elemdat.props = el_props
-            elemdat.iElm = iElm
-
-            element.globdat = globdat
-
-            if hasattr(element, "matProps"):
-                elemdat.matprops = element.matProps
-
-            if hasattr(element, "mat"):
-                element.mat.reset()
-
-            # Get the element contribution by calling the specified action
-            if hasattr(element, action):
-                getattr(element, action)(elemdat)
+        group = globdat.elements.groups[elementGroup]
 
-            # for label in elemdat.outlabel:
-            #  element.appendNodalOutput( label , globdat , elemdat.outdata )
-
-            # Assemble in the global array
-            if rank == 1:
-                B[el_dofs] += elemdat.fint
-                cc += elemdat.diss
-            elif rank == 2 and action == "getTangentStiffness":
-
-                row = append(row, repeat(el_dofs, len(el_dofs)))
-
-                for i in range(len(el_dofs)):
-                    col = append(col, el_dofs)
-
-                val = append(val, elemdat.stiff.reshape(len(el_dofs) * len(el_dofs)))
-
-                B[el_dofs] += elemdat.fint
-            elif rank == 2 and action == "getMassMatrix":
-
-                row = append(row, repeat(el_dofs, len(el_dofs)))
-
-                for i in range(len(el_dofs)):
-                    col = append(col, el_dofs)
-
-                val = append(val, elemdat.mass.reshape(len(el_dofs) * len(el_dofs)))
-
-                B[el_dofs] += elemdat.lumped
+        # The elements of a group share their class, so the kernel tells whether they implement the action
+        if not hasattr(group.kernel, action):
+            continue
+
+        node_rows = group.get_node_rows(globdat.nodes)
+        dof_columns = [globdat.dofs.dof_types.index(dof_type) for dof_type in group.kernel.dof_types]
+
+        # The geometric data which the elements of the group share over all iterations, if their kernel has any
+        geometry = group.get_geometry(globdat.nodes) if action != 'commit' else None
+
+        # The kernel evaluates all elements of a chunk at once if it has a group-level version of the action and
+        # the material of the group evaluates all its points at once
+        group_action = getattr(group.kernel, GROUP_ACTIONS.get(action, ''), None)
+        points = None
+        stiffness = None
+        if group_action is not None and geometry is not None:
+            points = group.get_material_points(geometry.weights.shape[1])
+            stiffness = group.get_elastic_stiffness(globdat.nodes)
+
+        # The coordinates and the degrees of freedom are gathered per chunk of elements, the size of the chunks
+        # is bounded by the memory budget
+        bytes_per_element = node_rows.shape[1] * (globdat.nodes.coords.shape[1] + len(globdat.dofs.dof_types)) * 8
+        if points is not None:
+            bytes_per_element += (geometry.b[0].size + node_rows.shape[1] * len(dof_columns)) * 8 * 4
+        chunk_size = get_chunk_size(bytes_per_element, memory_budget)
+
+        for chunk in iter_chunks(len(group), chunk_size):
+            chunk_rows = node_rows[chunk]
+            chunk_coords = globdat.nodes.coords[chunk_rows]
+            chunk_dofs = globdat.dofs.dofs[chunk_rows][:, :, dof_columns].reshape(len(chunk_rows), -1)
+
+            if points is not None:
+                groupdat = ElementGroupData(globdat.state[chunk_dofs], globdat.dstate[chunk_dofs])
+
+                groupdat.elements = chunk
+                groupdat.props = el_props
+                groupdat.geometry = geometry
+                groupdat.points = points
+                groupdat.stiffness = stiffness
+
+                group_action(groupdat)
+
+                # Assemble the stacked element arrays in the global array
+                if rank == 2:
+                    n = chunk_dofs.shape[1]
+                    count = len(chunk_dofs) * n * n
+                    row[position:position + count] = repeat(chunk_dofs, n, axis=1).reshape(count)
+                    col[position:position + count] = tile(chunk_dofs, n).reshape(count)
+                    val[position:position + count] = groupdat.stiff.reshape(count)
+                    position += count
+
+                np.add.at(B, chunk_dofs, groupdat.fint)
+                continue
+
+            # Loop over the elements in the chunk
+            for iElm in range(chunk.start, chunk.stop):
+
+                element = group.get_element(iElm)
+
+                # Get the element nodes
+                el_nodes = element.getNodes()
+
+                # Get the element coordinates
+                el_coords = chunk_coords[iElm - chunk.start]
+
+                # Get the element degrees of freedom
+                el_dofs = chunk_dofs[iElm - chunk.start]
+
+                # Get the element state
+                el_a = globdat.state[el_dofs]
+                el_Da = globdat.dstate[el_dofs]
+
+                # Create the an element state to pass through to the element
+                # el_state = Properties( { 'state' : el_a, 'dstate' : el_Da } )
+                elemdat = ElementData(el_a, el_Da)
+
+                elemdat.coords = el_coords
+                elemdat.nodes = el_nodes
+                elemdat.props = el_props
+                elemdat.iElm = iElm
+                elemdat.geometry = geometry
+
+                element.globdat = globdat
+
+                if hasattr(element, "matProps"):
+                    elemdat.matprops = element.matProps
+
+                if hasattr(element, "mat"):
+                    element.mat.reset()
+
+                # Get the element contribution by calling the specified action
+                if hasattr(element, action):
+                    getattr(element, action)(elemdat)
+
+                # Assemble in the global array
+                if rank == 1:
+                    B[el_dofs] += elemdat.fint
+                    cc += elemdat.diss
+                elif rank == 2 and action == "getTangentStiffness":
+                    n = len(el_dofs)
+                    row[position:position + n * n] = repeat(el_dofs, n)
+                    col[position:position + n * n] = tile(el_dofs, n)
+                    val[position:position + n * n] = elemdat.stiff.reshape(n * n)
+                    position += n * n
+
+                    B[el_dofs] += elemdat.fint
+                elif rank == 2 and action == "getMassMatrix":
+                    n = len(el_dofs)
+                    row[position:position + n * n] = repeat(el_dofs, n)
+                    col[position:position + n * n] = tile(el_dofs, n)
+                    val[position:position + n * n] = elemdat.mass.reshape(n * n)
+                    position += n * n
+
+                    B[el_dofs] += elemdat.lumped
     #    else:
     #      raise NotImplementedError('assemleArray is only implemented for vectors and matrices.')
 
     if rank == 1:
         return B, cc
     elif rank == 2:
+        row, val, col = row[:position], val[:position], col[:position]
 
-        '''if globdat.contact.flag:
-          row , val , col = globdat.contact.checkContact( row , val , col , B , globdat )      '''
+        contact = getattr(globdat, 'contact', None)
+        if contact is not None and contact.flag and action == "getTangentStiffness":
+            row, val, col = contact.checkContact(row, val, col, B, globdat)
 
         return coo_matrix((val, (row, col)), shape=(nDof, nDof)), B
 
@@ -129,6 +195,46 @@ def commit(props, globdat):
     return assembleArray(props, globdat, rank=0, action='commit')
 
 
+def assembleNodalOutput(props, globdat, output_names=None):
+    """
+    Recover the nodal output fields, such as the stresses, from the material output of the last evaluation of the
+    elements. Every node of an element gets the output of each integration point of the element with a weight of
+    one, and GlobalData.get_data returns the weighted averages.
+
+    The output is only needed by the writers, so the OutputManager calls this once per output cycle instead of
+    the elements accumulating it in every iteration.
+
+    :param props: the properties of the .pro file
+    :param globdat: the global data
+    :param output_names: the names of the fields to recover, all fields if None
+    """
+    globdat.reset_nodal_output()
+
+    for group in globdat.elements.groups.values():
+        labels, indices, data = group.get_output_data()
+
+        if data is None:
+            continue
+
+        node_rows = group.get_node_rows(globdat.nodes)
+
+        # The node rows and the values of all (element, point, node) triplets, in the order of the elements
+        shape = data.shape[:2] + (node_rows.shape[1],)
+        rows = np.broadcast_to(node_rows[indices][:, np.newaxis, :], shape).reshape(-1)
+
+        for column, name in enumerate(labels):
+            if output_names is not None and name not in output_names:
+                continue
+
+            if name in globdat.outputNames:
+                values, weights = getattr(globdat, name), getattr(globdat, name + 'Weights')
+            else:
+                values, weights = globdat.add_nodal_output(name)
+
+            np.add.at(values, rows, np.broadcast_to(data[:, :, column, np.newaxis], shape).reshape(-1))
+            np.add.at(weights, rows, 1.0)
+
+
 def getAllConstraints(props, globdat):
     # Loop over the element groups
     for elementGroup in globdat.elements.iter_group_names():
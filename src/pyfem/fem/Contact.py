@@ -1,6 +1,8 @@
 
 import numpy as np
-from numpy import append, repeat
+from numpy import concatenate, repeat, tile
+
+from pyfem.mesh.spatial import SpatialIndex
 
 
 # ===============================================================================
@@ -18,6 +20,7 @@ class Contact:
         self.direction = [0.0, 0.0]
         self.radius = 10.
         self.penalty = 1.e6
+        self.index = None
 
         if hasattr(props, 'contact'):
             if hasattr(props.contact, 'type'):
@@ -35,34 +38,43 @@ class Contact:
     def checkContact(self, row, val, col, B, globdat):
 
         if not self.flag:
-            return
+            return row, val, col
+
+        centre = self.centre + globdat.solver_status.lam * self.direction
+
+        # Only the nodes near the contact sphere are checked, using a spatial index over the deformed coordinates
+        columns = [globdat.dofs.dof_types.index(dof_type) for dof_type in self.dispDofs]
+        dofs = globdat.dofs.dofs[:, columns]
+
+        if self.index is None:
+            self.index = SpatialIndex(globdat.nodes.coords)
 
-        centre = self.centre + globdat.lam * self.direction
+        self.index.update(globdat.nodes.coords + globdat.state[dofs])
 
-        for node_id in list(globdat.nodes.keys()):
-            crd = globdat.nodes.get_node_coords(node_id)
+        node_rows = self.index.query_radius(centre, self.radius)
 
-            idofs = globdat.dofs.get_dof_ids_by_types([node_id], self.dispDofs)
+        idofs = dofs[node_rows]
 
-            crd += globdat.state[idofs]
+        crd = self.index.coords[node_rows]
 
-            ds = crd - centre
+        ds = crd - centre
 
-            dsnorm = np.linalg.norm(ds)
-            overlap = self.radius - dsnorm
+        dsnorm = np.linalg.norm(ds, axis=1)
+        overlap = self.radius - dsnorm
 
-            if overlap > 0:
-                normal = ds / dsnorm
+        inside = overlap > 0
+        idofs, ds, dsnorm, overlap = idofs[inside], ds[inside], dsnorm[inside], overlap[inside]
 
-                B[idofs] += -self.penalty * overlap * normal
+        normal = ds / dsnorm[:, np.newaxis]
 
-                mat = self.penalty * np.outer(normal, normal)
+        B[idofs] += -self.penalty * overlap[:, np.newaxis] * normal
 
-                row = append(row, repeat(idofs, len(idofs)))
+        mat = self.penalty * normal[:, :, np.newaxis] * normal[:, np.newaxis, :]
 
-                for i in range(len(idofs)):
-                    col = append(col, idofs)
+        n = idofs.shape[1]
 
-                val = append(val, mat.reshape(len(idofs) * len(idofs)))
+        row = concatenate([row, repeat(idofs, n, axis=1).reshape(-1)])
+        col = concatenate([col, tile(idofs, (1, n)).reshape(-1)])
+        val = concatenate([val, mat.reshape(-1)])
 
         return row, val, col
@@ -10,9 +10,10 @@ from scipy.sparse.linalg import spsolve
 
 from pyfem.fem.Constraint import Constraint
 from pyfem.fem.ElementSet import ElementSet
-from pyfem.utils.IntegerIdDict import IntegerIdDict
+from pyfem.io.dat_reader import DatFile
 from pyfem.utils.logger import get_logger
-from pyfem.utils.parser import read_node_table, NodeTable
+from pyfem.utils.out_of_core import ScratchSpace
+from pyfem.utils.parser import read_node_tables, NodeTable
 
 logger = get_logger()
 
@@ -21,12 +22,9 @@ class DofSpace:
     def __init__(self, elements: ElementSet) -> None:
         self.constraint = None
         self.dof_types = elements.get_dof_types()
-        self.dofs = array(list(range(len(elements.nodes) * len(self.dof_types)))).reshape(
+        self.dofs = np.arange(len(elements.nodes) * len(self.dof_types)).reshape(
             (len(elements.nodes), len(self.dof_types)))
         self.nodes = elements.nodes
-        self.id_map = IntegerIdDict()
-        for index, id_ in enumerate(elements.nodes):
-            self.id_map.add_item_by_id(id_, index)
         self.all_constrained_dofs = []
         self.number_of_dofs = self.get_number_of_dofs()
 
@@ -44,10 +42,16 @@ class DofSpace:
             self.constraint.constrained_factors[load_case] = factor
 
     def read_from_file(self, file_name: str) -> None:
+        self.read_from_dat(DatFile(file_name))
+
+    def read_from_dat(self, dat: DatFile) -> None:
         logger.info("Reading constraints ..........")
-        node_table = read_node_table(file_name, "NodeConstraints", self.nodes)
+        node_table = read_node_tables(dat.get_sections("NodeConstraints"), self.nodes)
         self.constraint = self.create_constrain(node_table)
 
+    def to_scratch(self, scratch: ScratchSpace) -> None:
+        self.dofs = scratch.array(self.dofs)
+
     def create_constrain(self, node_tables: Union[List[NodeTable], None] = None) -> Constraint:
         constraint = Constraint(self.get_number_of_dofs())
         if node_tables is None:
@@ -71,7 +75,7 @@ class DofSpace:
                 if node_id not in self.nodes:
                     raise RuntimeError('Node ID ' + str(node_id) + ' does not exist')
 
-                index = self.id_map.get_items_by_ids(node_id)
+                index = self.nodes.get_indices_by_ids(node_id)
 
                 if dof_type not in self.dof_types:
                     raise RuntimeError('DOF type "' + dof_type + '" does not exist')
@@ -88,7 +92,7 @@ class DofSpace:
                     if not slave_node_id[0] in self.nodes:
                         raise RuntimeError('Node ID ' + str(slave_node_id) + ' does not exist')
 
-                    slave_index = self.id_map.get_items_by_ids(slave_node_id)
+                    slave_index = self.nodes.get_indices_by_ids(slave_node_id)
 
                     if slave_dof_type not in self.dof_types:
                         raise RuntimeError('DOF type "' + slave_dof_type + '" does not exist')
@@ -105,27 +109,25 @@ class DofSpace:
 
         return constraint
 
-    def get_dof_ids_by_type(self, node_ids: Union[int, List[int]], dof_type: str) -> Union[int, List[int]]:
+    def get_dof_ids_by_type(self, node_ids: Union[int, List[int], np.ndarray], dof_type: str) -> Union[int, np.ndarray]:
         """
-        Get dof_id (or list of dof_ids) for a given dof_type and node (or list of nodes).
+        Get dof_id (or array of dof_ids) for a given dof_type and node (or list of nodes).
         :param node_ids:
         :param dof_type:
         :return:
         """
-        return self.dofs[self.id_map.get_items_by_ids(node_ids), self.dof_types.index(dof_type)]
+        return self.dofs[self.nodes.get_indices_by_ids(node_ids), self.dof_types.index(dof_type)]
 
-    def get_dof_ids_by_types(self, node_ids: List[int], dof_types: List[str]) -> List[int]:
+    def get_dof_ids_by_types(self, node_ids: Union[List[int], np.ndarray], dof_types: List[str]) -> np.ndarray:
         """
-        Get list of dof_ids for given list of dof_types and list of nodes.
+        Get array of dof_ids for given list of dof_types and list of nodes, ordered node by node.
         :param node_ids:
         :param dof_types:
         :return:
         """
-        dofs_ = []
-        for node_id in node_ids:
-            for dof_type in dof_types:
-                dofs_.append(self.dofs[self.id_map.get_items_by_ids(node_id), self.dof_types.index(dof_type)])
-        return dofs_
+        rows = self.nodes.get_indices_by_ids(np.asarray(node_ids, dtype=int))
+        columns = [self.dof_types.index(dof_type) for dof_type in dof_types]
+        return self.dofs[np.ix_(rows, columns)].flatten()
 
     def get_dof_name_by_id(self, dof_id: int) -> str:
         """
@@ -148,7 +150,7 @@ class DofSpace:
         """
         The function is not used.
         """
-        return self.dofs[self.id_map.get_items_by_ids(node_ids)].flatten()
+        return self.dofs[self.nodes.get_indices_by_ids(node_ids)].flatten()
 
     def copy_constrain(self, dof_types: list = None) -> Constraint:
         """
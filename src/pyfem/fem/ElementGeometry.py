@@ -0,0 +1,37 @@
+from typing import Dict
+
+import numpy as np
+
+
+class ElementGeometry:
+    """
+    The geometric data of all elements of a group at their integration points, stored as stacked arrays with the
+    element position in the group as the first axis, e.g.
+
+        dhdx    (number_of_elements, number_of_points, number_of_nodes, rank)
+        weights (number_of_elements, number_of_points)
+        b       (number_of_elements, number_of_points, number_of_strains, number_of_dofs)
+
+    Under small strains the data only depends on the node coordinates, so it is computed once by the element
+    kernel and reused by every iteration and load step. The modification counter of the node set when the data
+    was computed is kept to detect changes of the node coordinates.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], modification_count: int) -> None:
+        self.arrays = arrays
+        self.modification_count = modification_count
+
+        for name, a in arrays.items():
+            setattr(self, name, a)
+
+    def is_valid(self, modification_count: int) -> bool:
+        """
+        Check that the node coordinates have not changed since the data was computed.
+
+        Parameters:
+            modification_count (int): The current modification counter of the node set.
+
+        Returns:
+            bool: True if the data can be reused.
+        """
+        return modification_count == self.modification_count
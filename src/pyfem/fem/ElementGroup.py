@@ -0,0 +1,422 @@
+from typing import Dict, Iterator, List, Union
+
+import numpy as np
+
+from pyfem.fem.ElementGeometry import ElementGeometry
+from pyfem.materials.MaterialManager import MaterialManager
+from pyfem.materials.MaterialPoints import MaterialPoints
+from pyfem.materials.MaterialTrace import MaterialTrace
+from pyfem.utils.data_structures import Properties
+from pyfem.utils.logger import get_logger
+from pyfem.utils.out_of_core import DEFAULT_MEMORY_BUDGET, ScratchSpace, get_chunk_size, iter_chunks
+
+logger = get_logger()
+
+
+class ElementGroup:
+    """
+    A group of elements which share the same element type and group properties.
+
+    The connectivity of the group is one (number_of_elements, number_of_element_nodes) integer array of node ids. A
+    single element object, the kernel, holds the group-level data such as the dof types and the family, and
+    evaluates ranges of elements at once if it implements group-level actions.
+
+    The data which the kernel needs for this is computed on the first request and cached by the group: the
+    geometric data of get_geometry, the material points of get_material_points and the elastic stiffness matrices
+    of get_elastic_stiffness. When the history is committed, commit_history also evaluates the failure indices,
+    which are added to the output data.
+
+    Per-element objects are only created on request and are cached afterwards, because they carry the history of
+    the elements which are evaluated one by one.
+    """
+
+    def __init__(self, name: str, props: Properties, element_class: type) -> None:
+        self.name = name
+        self.props = props
+        self.element_class = element_class
+        self.kernel = None
+        self.elements: Dict[int, object] = {}
+        self._ids: np.ndarray = np.empty(0, dtype=int)
+        self._connectivity: np.ndarray = np.empty(shape=(0, 0), dtype=int)
+        self._pending_ids: List[np.ndarray] = []
+        self._pending_connectivity: List[np.ndarray] = []
+        self._nodes_per_element = None
+        self._node_rows = None
+        self._geometry = None
+        self._material_points = None
+        self._stiffness = None
+        self._stiffness_geometry = None
+        self._failure = None
+        self._failure_indices = None
+        self._size = 0
+        self.scratch = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[object]:
+        for index in range(len(self)):
+            yield self.get_element(index)
+
+    @property
+    def ids(self) -> np.ndarray:
+        """
+        The element ids of the group, in the order in which they were added.
+
+        Returns:
+            np.ndarray: An integer array of element ids.
+        """
+        self._flush()
+        return self._ids
+
+    @property
+    def connectivity(self) -> np.ndarray:
+        """
+        The (number_of_elements, number_of_element_nodes) array of node ids.
+
+        Returns:
+            np.ndarray: The connectivity array.
+        """
+        self._flush()
+        return self._connectivity
+
+    @property
+    def nodes_per_element(self) -> int:
+        return self._nodes_per_element
+
+    def add_elements(self, element_ids: Union[List[int], np.ndarray],
+                     connectivity: Union[List[List[int]], np.ndarray]) -> None:
+        """
+        Add a block of elements to the group.
+
+        Parameters:
+            element_ids (Union[List[int], np.ndarray]): The ids of the elements.
+            connectivity (Union[List[List[int]], np.ndarray]): The node ids of each element, one row per element.
+
+        Returns:
+            None
+        """
+        element_ids = np.asarray(element_ids, dtype=int)
+        connectivity = np.asarray(connectivity, dtype=int).reshape(len(element_ids), -1)
+
+        if self._nodes_per_element is None:
+            self._nodes_per_element = connectivity.shape[1]
+            self.kernel = self.element_class(connectivity[0].tolist(), self.props)
+        elif connectivity.shape[1] != self._nodes_per_element:
+            raise RuntimeError(f"All elements in the element group {self.name} must have the same number of nodes")
+
+        self._pending_ids.append(element_ids)
+        self._pending_connectivity.append(connectivity)
+        self._node_rows = None
+        self._geometry = None
+        self.close()
+        self._stiffness = None
+        self._size += len(element_ids)
+
+    def get_node_rows(self, nodes) -> np.ndarray:
+        """
+        Get the row indices of the element nodes in the node coordinate array.
+
+        Parameters:
+            nodes (NodeSet): The node set which the connectivity refers to.
+
+        Returns:
+            np.ndarray: A (number_of_elements, number_of_element_nodes) array of node rows.
+        """
+        if self._node_rows is None:
+            self._node_rows = nodes.get_indices_by_ids(self.connectivity)
+            if self.scratch is not None:
+                self._node_rows = self.scratch.array(self._node_rows)
+        return self._node_rows
+
+    def get_geometry(self, nodes) -> Union[ElementGeometry, None]:
+        """
+        Get the geometric data of all elements of the group, computed by the get_geometry(coords) function of the
+        kernel for chunks of elements within the memory budget. The data is computed on the first request and
+        again when the node coordinates have changed.
+
+        Parameters:
+            nodes (NodeSet): The node set which the connectivity refers to.
+
+        Returns:
+            ElementGeometry: The geometric data, or None if the kernel does not implement get_geometry.
+        """
+        if not hasattr(self.kernel, 'get_geometry'):
+            return None
+
+        if self._geometry is not None and self._geometry.is_valid(nodes.modification_count):
+            return self._geometry
+
+        coords = nodes.coords
+
+        node_rows = self.get_node_rows(nodes)
+        memory_budget = DEFAULT_MEMORY_BUDGET if self.scratch is None else self.scratch.memory_budget
+        empty = np.empty if self.scratch is None else self.scratch.empty
+
+        # The size of the data of one element bounds the size of the chunks
+        bytes_per_element = sum(a.nbytes for a in self.kernel.get_geometry(coords[node_rows[:1]]).values())
+        chunk_size = get_chunk_size(bytes_per_element, memory_budget)
+
+        arrays = {}
+        for chunk in iter_chunks(len(self), chunk_size):
+            for name, a in self.kernel.get_geometry(coords[node_rows[chunk]]).items():
+                if name not in arrays:
+                    arrays[name] = empty((len(self),) + a.shape[1:], dtype=a.dtype)
+                arrays[name][chunk] = a
+
+        self._geometry = ElementGeometry(arrays, nodes.modification_count)
+        return self._geometry
+
+    def get_material_points(self, points_per_element: int) -> Union[MaterialPoints, None]:
+        """
+        Get the material points of all elements of the group, which are created on the first request. The points
+        share one material object, which is evaluated point by point by BaseMaterial if it has no batched
+        getStresses.
+
+        Parameters:
+            points_per_element (int): The number of integration points of each element.
+
+        Returns:
+            MaterialPoints: The material points, or None if the group has no material.
+        """
+        if self._material_points is not None and self._material_points.shape[1] == points_per_element:
+            return self._material_points
+
+        mat_props = getattr(self.props, 'material', None)
+
+        if mat_props is None or not hasattr(mat_props, 'type'):
+            return None
+
+        material = MaterialManager(mat_props).material(mat_props)
+
+        self.close()
+
+        empty = np.empty if self.scratch is None else self.scratch.empty
+        self._material_points = MaterialPoints(material, len(self), points_per_element, empty)
+
+        if material.traceFile is not None:
+            self._material_points.set_trace(MaterialTrace(material.traceFile, self.ids, points_per_element,
+                                                          material.traceElements, material.tracePoints))
+
+        return self._material_points
+
+    def get_elastic_stiffness(self, nodes) -> Union[np.ndarray, None]:
+        """
+        Get the stiffness matrices of all elements of the group for the constant or the elastic tangent of the
+        material. They are computed by the get_constant_stiffness function of the kernel for chunks of elements
+        within the memory budget, on the first request and again when the geometric data has changed.
+
+        Parameters:
+            nodes (NodeSet): The node set which the connectivity refers to.
+
+        Returns:
+            np.ndarray: The (number_of_elements, number_of_dofs, number_of_dofs) array of stiffness matrices, or
+            None if the material of the group has no elastic tangent or the kernel does not implement
+            get_constant_stiffness.
+        """
+        points = self._material_points
+
+        if points is None or points.elasticTangent is None or not hasattr(self.kernel, 'get_constant_stiffness'):
+            return None
+
+        geometry = self.get_geometry(nodes)
+        if self._stiffness is not None and self._stiffness_geometry is geometry:
+            return self._stiffness
+
+        memory_budget = DEFAULT_MEMORY_BUDGET if self.scratch is None else self.scratch.memory_budget
+        empty = np.empty if self.scratch is None else self.scratch.empty
+
+        stiffness = None
+        for chunk in iter_chunks(len(self), get_chunk_size(geometry.b[0].nbytes * 2, memory_budget)):
+            chunk_stiffness = self.kernel.get_constant_stiffness(geometry, chunk, points.elasticTangent)
+            if stiffness is None:
+                stiffness = empty((len(self),) + chunk_stiffness.shape[1:], dtype=float)
+            stiffness[chunk] = chunk_stiffness
+
+        self._stiffness = stiffness
+        self._stiffness_geometry = geometry
+        return self._stiffness
+
+    def get_active_count(self) -> Union[int, None]:
+        """
+        Get the number of active elements of the last evaluation, i.e. the elements with a point which did not
+        behave elastically.
+
+        Returns:
+            int: The number of active elements, or None if the group does not track them.
+        """
+        points = self._material_points
+
+        if points is None or points.active is None:
+            return None
+
+        return int(np.count_nonzero(points.active))
+
+    def get_output_data(self):
+        """
+        Get the material output of the last evaluation of the elements of the group, with the failure indices of
+        the last converged step if the material has a failure criterion.
+
+        Returns:
+            tuple: The output labels, the positions of the elements with output in the group and the
+            (number_of_elements, number_of_points, number_of_labels) array of output data, or None as the data
+            if no element has output.
+        """
+        labels, indices, data = self._get_material_output()
+
+        if data is not None and self._failure_indices is not None and self._failure_indices.shape == data.shape[:2]:
+            labels = list(labels) + [self._failure.outLabel]
+            data = np.concatenate([data, self._failure_indices[:, :, np.newaxis]], axis=2)
+
+        return labels, indices, data
+
+    def get_failure_criterion(self):
+        """
+        Get the failure criterion of the material of the group, which is created on the first request.
+
+        Returns:
+            BaseFailure: The failure criterion, or None if the material has none.
+        """
+        if self._failure is None:
+            mat_props = getattr(self.props, 'material', None)
+
+            if mat_props is not None and hasattr(mat_props, 'failureType'):
+                self._failure = MaterialManager(mat_props).failure
+
+        return self._failure
+
+    def evaluate_failure(self) -> None:
+        """
+        Evaluate the failure indices of all points of the group from the stresses of the last evaluation, and log
+        their maximum and the number of failed points, i.e. the points with an index of one or more.
+
+        Returns:
+            None
+        """
+        failure = self.get_failure_criterion()
+
+        if failure is None:
+            return
+
+        labels, _, data = self._get_material_output()
+        columns = None if data is None else failure.getStressColumns(list(labels))
+
+        if columns is None:
+            self._failure_indices = None
+            return
+
+        stresses = data[:, :, columns]
+        self._failure_indices = failure.getFailureIndices(
+            stresses.reshape(-1, len(columns))).reshape(stresses.shape[:2])
+
+        logger.info('    Failure %s : max index %6.4e, %i of %i points failed' %
+                    (self.name, self._failure_indices.max(), np.count_nonzero(self._failure_indices >= 1.0),
+                     self._failure_indices.size))
+
+    def _get_material_output(self):
+        points = self._material_points
+
+        # The output of a material with a constant tangent are the stresses, which are computed from the element
+        # states of the last evaluation
+        if points is not None and points.states is not None:
+            return points.outLabels, np.arange(len(self)), self.kernel.get_constant_stresses(
+                self._geometry, points.states, points.tangent)
+
+        if points is not None and points.outData is not None:
+            return points.outLabels, np.arange(len(self)), points.outData
+
+        labels = []
+        indices = []
+        data = []
+
+        for index in sorted(self.elements):
+            element_labels, element_data = self.elements[index].getOutputData()
+            if element_data is not None:
+                labels = element_labels
+                indices.append(index)
+                data.append(element_data)
+
+        if not data:
+            return labels, np.array(indices, dtype=int), None
+
+        return labels, np.array(indices, dtype=int), np.array(data)
+
+    def commit_history(self) -> None:
+        """
+        Commit the history of the material points of the group, the elements commit their own history, and
+        evaluate the failure indices of the converged step if the material has a failure criterion.
+
+        Returns:
+            None
+        """
+        if self._material_points is not None:
+            self._material_points.commit_history()
+
+            if self._material_points.pool is not None:
+                self._material_points.pool.log_load_balance(self.name)
+
+        self.evaluate_failure()
+
+    def rollback_history(self) -> None:
+        """
+        Discard the trial history of the material points of the group.
+
+        Returns:
+            None
+        """
+        if self._material_points is not None:
+            self._material_points.rollback_history()
+
+    def close(self) -> None:
+        """
+        Release the material points of the group, which stops the worker processes of their material pool.
+
+        Returns:
+            None
+        """
+        if self._material_points is not None:
+            self._material_points.close()
+            self._material_points = None
+
+    def to_scratch(self, scratch: ScratchSpace) -> None:
+        """
+        Move the connectivity array, and the node rows and the geometric data once they are computed, to
+        memory-mapped files of the scratch space.
+
+        Parameters:
+            scratch (ScratchSpace): The scratch space.
+
+        Returns:
+            None
+        """
+        self.scratch = scratch
+        self._connectivity = scratch.array(self.connectivity)
+        if self._node_rows is not None:
+            self._node_rows = scratch.array(self._node_rows)
+        if self._geometry is not None:
+            self._geometry = ElementGeometry({name: scratch.array(a) for name, a in self._geometry.arrays.items()},
+                                             self._geometry.modification_count)
+
+    def get_element(self, index: int) -> object:
+        """
+        Get the element object at the given position in the group. The object is created on the first request.
+
+        Parameters:
+            index (int): The position of the element in the group.
+
+        Returns:
+            Element: The element object.
+        """
+        element = self.elements.get(index)
+        if element is None:
+            element = self.element_class(self.connectivity[index].tolist(), self.props)
+            self.elements[index] = element
+        return element
+
+    def _flush(self) -> None:
+        if self._pending_ids:
+            self._ids = np.concatenate([self._ids] + self._pending_ids)
+            self._connectivity = np.concatenate(
+                [self._connectivity.reshape(-1, self._nodes_per_element)] + self._pending_connectivity)
+            self._pending_ids = []
+            self._pending_connectivity = []
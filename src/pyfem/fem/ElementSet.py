@@ -1,31 +1,38 @@
 import os
-import re
-from typing import List, Union, TextIO, Iterator
+from typing import Dict, List, Tuple, Union, Iterator
 
 import meshio
+import numpy as np
+from scipy.sparse import csr_matrix
 
+from pyfem.fem.ElementGroup import ElementGroup
 from pyfem.fem.NodeSet import NodeSet
-from pyfem.utils.IntegerIdDict import IntegerIdDict
+from pyfem.io.dat_reader import DatFile, parse_elements
+from pyfem.utils.IntegerIdDict import IntegerIdIndex
 from pyfem.utils.data_structures import SolverStatus, Properties
 from pyfem.utils.logger import get_logger
+from pyfem.utils.out_of_core import ScratchSpace
 
 logger = get_logger()
 
-ELEMENTS_START = "<Elements>"
-ELEMENTS_END = "</Elements>"
-GMSH_START = "gmsh"
-COMMENT_STARTERS = ["//", "#"]
+ELEMENTS_LABEL = "Elements"
 
 
-class ElementSet(IntegerIdDict):
+class ElementSet(IntegerIdIndex):
+    """
+    The elements are stored per group in ElementGroup objects which hold the connectivity of the group in one
+    integer array. The dict maps each element id to its row, i.e. the order in which the elements were added.
+    """
 
     def __init__(self, nodes: NodeSet, props: Properties):
         super().__init__()
         self.nodes = nodes
         self.props = props
         self.solver_status = SolverStatus()
-        self.groups = {}
+        self.groups: Dict[str, ElementGroup] = {}
         self.families = ['CONTINUUM', 'INTERFACE', 'SURFACE', 'BEAM', 'SHELL']
+        self._adjacency: Dict[object, csr_matrix] = {}
+        self._adjacency_size = None
 
     def __iter__(self) -> iter:
         for group_name in self.iter_group_names():
@@ -47,84 +54,90 @@ class ElementSet(IntegerIdDict):
 
     def get_dof_types(self) -> List[str]:
         dof_types = []
-        for element in self:
-            for dof_type in element.dof_types:
+        for group in self.groups.values():
+            for dof_type in group.kernel.dof_types:
                 if dof_type not in dof_types:
                     dof_types.append(dof_type)
         return dof_types
 
     def read_from_file(self, file_name: str) -> None:
+        self.read_from_dat(DatFile(file_name))
+
+    def read_from_dat(self, dat: DatFile) -> None:
         logger.info("Reading elements .............")
-        with open(file_name, 'r') as f:
-            for line in f:
-                line = line.strip().replace(' ', '').replace('\n', '').replace('\t', '').replace('\r', '')
-                if line.startswith(GMSH_START):  # If the line starts with GMSH_START, read a Gmsh file
-                    clean_line = line.replace(';', '').replace('\"', '').replace('\'', '')
-                    gmsh_file_name = clean_line.split('=')[1]
-                    self.read_gmsh_file(gmsh_file_name)
-                elif line.startswith(ELEMENTS_START):  # If the line starts with NODES_START, read the node coordinates
-                    self.read_element_connectivity(f)
-
-    def read_element_connectivity(self, f: TextIO) -> None:
-        while True:
-            line = f.readline().strip().replace('\"', '').replace('\'', '')
-
-            if line.replace(' ', '').startswith(ELEMENTS_END):
-                # If the line starts with NODES_END, return from the function
-                return
-
-            items = [x for x in re.split(r';|\s', line) if x]  # Split the line into items
-
-            first_item = items[0] if items else ''  # If items are empty return '' else return items[0]
-            if any(first_item.startswith(comment) for comment in COMMENT_STARTERS):
-                continue  # If the line is a comment, skip it
-
-            if items and items[0].isdigit():
-                # If the first item is a digit, add the element types and connectivity to the ElementSet object
-                self.add_item_by_element_id(int(items[0]), str(items[1]), [int(node_id) for node_id in items[2:]])
+
+        if dat.mesh is not None:  # If the file refers to a Gmsh file, add the elements of the Gmsh mesh
+            self.read_gmsh_mesh(dat.mesh)
+
+        for section in dat.get_sections(ELEMENTS_LABEL):  # Read the element connectivity of an <Elements> section
+            self.read_element_connectivity(section.body)
+
+    def read_element_connectivity(self, body: str) -> None:
+        # Parse the whole section at once and add the elements group by group
+        for element_group_name, (element_ids, element_connectivity) in parse_elements(body).items():
+            self.add_items_by_element_ids(element_group_name, element_ids, element_connectivity)
 
     def read_gmsh_file(self, file_name: str) -> None:
-        mesh = meshio.read(file_name, file_format="gmsh")  # Use package meshio to open the .msh file
+        self.read_gmsh_mesh(meshio.read(file_name, file_format="gmsh"))  # Use package meshio to open the .msh file
+
+    def read_gmsh_mesh(self, mesh: meshio.Mesh) -> None:
+        cell_sets = mesh.cell_sets_dict  # meshio rebuilds these dicts on every access
+        cells = mesh.cells_dict
         element_id = 0
-        for element_group_name in mesh.cell_sets_dict:  # element_group_name is the name of the element group
-            for mesh_type in mesh.cell_sets_dict[element_group_name]:  # The mesh type, such as line, quad ...
-                for id_ in mesh.cell_sets_dict[element_group_name][mesh_type]:  # Element id in the certain mesh type
-                    element_connectivity = mesh.cells_dict[mesh_type][id_]
-                    self.add_item_by_element_id(element_id, element_group_name, element_connectivity.tolist())
-                    element_id += 1
+        for element_group_name in cell_sets:  # element_group_name is the name of the element group
+            for mesh_type in cell_sets[element_group_name]:  # The mesh type, such as line, quad ...
+                ids = cell_sets[element_group_name][mesh_type]  # Element ids in the certain mesh type
+                element_connectivity = cells[mesh_type][ids]
+                element_ids = np.arange(element_id, element_id + len(ids))
+                self.add_items_by_element_ids(element_group_name, element_ids, element_connectivity)
+                element_id += len(ids)
+
+    def clear(self) -> None:
+        """
+        Remove all elements and element groups, e.g. to replace the elements by refined ones.
+        :return:
+        """
+        super().clear()
+        self.groups = {}
+        self._adjacency = {}
 
     def add_item_by_element_id(self, element_id: int, element_group_name: str, element_connectivity: List[int]) -> None:
+        self.add_items_by_element_ids(element_group_name, [element_id], [element_connectivity])
+
+    def add_items_by_element_ids(self, element_group_name: str, element_ids: Union[List[int], np.ndarray],
+                                 element_connectivity: Union[List[List[int]], np.ndarray]) -> None:
         if hasattr(self.props, element_group_name):  # If element_group_name is defined in the .pro file
-            element_group_props = getattr(self.props, element_group_name)  # Get the element properties by the name
+            element_connectivity = np.asarray(element_connectivity, dtype=int).reshape(len(element_ids), -1)
 
-            element_type = getattr(element_group_props, 'type', None)
-            if not element_type:
-                raise RuntimeError(f"Missing element type for the element group {element_group_name}")
+            # Check if the node ids are valid
+            try:
+                self.nodes.get_indices_by_ids(element_connectivity)
+            except ValueError:
+                invalid_node_ids = np.setdiff1d(element_connectivity, self.nodes.ids).tolist()
+                raise RuntimeError(f"Invalid node IDs: {invalid_node_ids}")
 
-            element_group_props.rank = self.nodes.rank  # Update the object element_group_props
-            element_group_props.solver_status = self.solver_status  # Update the object element_group_props
+            if element_group_name not in self.groups:
+                self.groups[element_group_name] = self.create_element_group(element_group_name)
 
-            # Import the element module and create the element
-            element_module = __import__('pyfem.elements.' + element_type, globals(), locals(), element_type, 0)
-            element = getattr(element_module, element_type)
-            elem = element(element_connectivity, element_group_props)  # Create the element
+            self.add_ids(element_ids)  # Add the elements to the element set
+            self._adjacency = {}  # The adjacency is rebuilt on the next request
+            self.groups[element_group_name].add_elements(element_ids, element_connectivity)  # Add to the group
 
-            # Check if the node ids are valid
-            invalid_node_ids = [node_id for node_id in elem.getNodes() if node_id not in self.nodes]
-            if invalid_node_ids:
-                raise RuntimeError(f"Invalid node IDs: {invalid_node_ids}")
+    def create_element_group(self, element_group_name: str) -> ElementGroup:
+        element_group_props = getattr(self.props, element_group_name)  # Get the element properties by the name
 
-            self.add_item_by_id(element_id, elem)  # Add the element to the element set
-            self.add_to_group_by_id(element_group_name, element_id)  # Add the element to the correct group
+        element_type = getattr(element_group_props, 'type', None)
+        if not element_type:
+            raise RuntimeError(f"Missing element type for the element group {element_group_name}")
 
-    def add_to_group_by_id(self, group_name: str, id_: int) -> None:
-        if group_name not in self.groups:
-            self.groups[group_name] = [id_]
-        else:
-            self.groups[group_name].append(id_)
+        element_group_props.rank = self.nodes.rank  # Update the object element_group_props
+        element_group_props.solver_status = self.solver_status  # Update the object element_group_props
+
+        # Import the element module, the elements of the group are created by the ElementGroup object
+        element_module = __import__('pyfem.elements.' + element_type, globals(), locals(), element_type, 0)
+        element = getattr(element_module, element_type)
 
-    def add_to_group_by_ids(self, group_name: str, ids: List[int]) -> None:
-        self.groups[group_name] = ids
+        return ElementGroup(element_group_name, element_group_props, element)
 
     def iter_group_names(self) -> Iterator[str]:
         return iter(self.groups)
@@ -133,10 +146,9 @@ class ElementSet(IntegerIdDict):
         if group_name == "All":
             return iter(self)
         elif isinstance(group_name, list):
-            elems = [item for name in group_name for item in self.get_items_by_ids(self.groups[name])]
-            return iter(elems)
+            return (element for name in group_name for element in self.groups[name])
         elif isinstance(group_name, str):
-            return iter(self.get_items_by_ids(self.groups[group_name]))
+            return iter(self.groups[group_name])
         else:
             raise TypeError("Argument to iter_element_group() must be str, or list of strs")
 
@@ -163,15 +175,139 @@ class ElementSet(IntegerIdDict):
         Get all elements' indices in the list self.families.
         :return:
         """
-        return [self.families.index(element.family) for element in self]
+        family_ids = []
+        for group in self.groups.values():
+            family_ids.extend([self.families.index(group.kernel.family)] * len(group))
+        return family_ids
+
+    def get_element_node_incidence(self) -> csr_matrix:
+        """
+        Get the element-node incidence matrix. Row i holds the node rows of the element with row index i, in the
+        order of its connectivity. The matrix is built once with vectorized operations and cached until elements
+        or nodes are added.
+        :return: the (number_of_elements, number_of_nodes) CSR matrix
+        """
+        incidence = self._get_cached_adjacency('element_node')
+        if incidence is None:
+            counts = np.zeros(len(self), dtype=int)
+            group_rows = {}
+            for name, group in self.groups.items():
+                group_rows[name] = self.get_indices_by_ids(group.ids)
+                counts[group_rows[name]] = group.nodes_per_element
+
+            indptr = np.concatenate([[0], np.cumsum(counts)])
+            indices = np.empty(indptr[-1], dtype=int)
+            for name, group in self.groups.items():
+                positions = indptr[group_rows[name]][:, np.newaxis] + np.arange(group.nodes_per_element)
+                indices[positions] = group.get_node_rows(self.nodes)
+
+            incidence = csr_matrix((np.ones(len(indices), dtype=np.int32), indices, indptr),
+                                   shape=(len(self), len(self.nodes)))
+            self._adjacency['element_node'] = incidence
+        return incidence
+
+    def get_node_element_adjacency(self) -> csr_matrix:
+        """
+        Get the node to element adjacency. Row i holds the rows of the elements which contain the node with row
+        index i, sorted by element row.
+        :return: the (number_of_nodes, number_of_elements) CSR matrix
+        """
+        adjacency = self._get_cached_adjacency('node_element')
+        if adjacency is None:
+            adjacency = self.get_element_node_incidence().T.tocsr()
+            adjacency.sort_indices()
+            self._adjacency['node_element'] = adjacency
+        return adjacency
+
+    def get_element_adjacency(self, min_shared_nodes: int = 1) -> csr_matrix:
+        """
+        Get the element to element adjacency, i.e. the element dual graph, in which two elements are connected if
+        they share at least min_shared_nodes nodes. The value of an entry is the number of shared nodes.
+        :param min_shared_nodes: the number of nodes two elements must share to be connected
+        :return: the symmetric (number_of_elements, number_of_elements) CSR matrix without diagonal
+        """
+        adjacency = self._get_cached_adjacency(('element_element', min_shared_nodes))
+        if adjacency is None:
+            incidence = self.get_element_node_incidence()
+            adjacency = (incidence @ self.get_node_element_adjacency()).tocsr()
+            adjacency.setdiag(0)
+            adjacency.data[adjacency.data < min_shared_nodes] = 0
+            adjacency.eliminate_zeros()
+            adjacency.sort_indices()
+            self._adjacency[('element_element', min_shared_nodes)] = adjacency
+        return adjacency
+
+    def get_element_ids_by_node_id(self, node_id: int) -> np.ndarray:
+        """
+        Get the ids of the elements which contain a node.
+        :param node_id: the node id
+        :return: the element ids, sorted by element row
+        """
+        adjacency = self.get_node_element_adjacency()
+        row = self.nodes.get_indices_by_ids(node_id)
+        return self.ids[adjacency.indices[adjacency.indptr[row]:adjacency.indptr[row + 1]]]
+
+    def _get_cached_adjacency(self, key: object) -> Union[csr_matrix, None]:
+        if self._adjacency_size != (len(self), len(self.nodes)):
+            self._adjacency = {}
+            self._adjacency_size = (len(self), len(self.nodes))
+        return self._adjacency.get(key)
+
+    def to_scratch(self, scratch: ScratchSpace) -> None:
+        """
+        Move the connectivity arrays of all groups to memory-mapped files of the scratch space.
+        :param scratch: the scratch space
+        :return:
+        """
+        for group in self.groups.values():
+            group.to_scratch(scratch)
 
     def update_commit_history(self) -> None:
         """
-        Call the commit_history() function of all elements in the object.
+        Call the commit_history() function of all element groups and of all elements which have been created in
+        the object.
+        :return:
+        """
+        for group in self.groups.values():
+            group.commit_history()
+            for element in group.elements.values():
+                element.commit_history()
+
+    def get_active_set_size(self) -> Union[Tuple[int, int], None]:
+        """
+        Get the size of the active set of the last evaluation, i.e. the number of elements with a point which did
+        not behave elastically, in the groups which track it.
+        :return: the number of active elements and the number of elements of these groups, or None if no group
+            tracks the active set
+        """
+        active = 0
+        total = 0
+
+        for group in self.groups.values():
+            count = group.get_active_count()
+            if count is not None:
+                active += count
+                total += len(group)
+
+        return (active, total) if total else None
+
+    def rollback_history(self) -> None:
+        """
+        Discard the trial history of the material points of all element groups, e.g. to restart a step. The
+        history of the elements with per-element materials is not affected.
+        :return:
+        """
+        for group in self.groups.values():
+            group.rollback_history()
+
+    def close(self) -> None:
+        """
+        Release the material points of all element groups at the end of the analysis, which stops the worker
+        processes of their material pools.
         :return:
         """
-        for element in list(self.values()):
-            element.commit_history()
+        for group in self.groups.values():
+            group.close()
 
 
 if __name__ == "__main__":
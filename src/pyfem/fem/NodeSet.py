@@ -1,29 +1,42 @@
 import os
-import re
-from typing import Dict, List, Union, TextIO
+from typing import Dict, List, Union
 
 import meshio
 import numpy as np
 
-from pyfem.utils.IntegerIdDict import IntegerIdDict
+from pyfem.io.dat_reader import DatFile, parse_nodes, parse_node_group
+from pyfem.mesh.spatial import SpatialIndex
+from pyfem.utils.IntegerIdDict import IntegerIdIndex
 from pyfem.utils.logger import get_logger
+from pyfem.utils.out_of_core import ScratchSpace
 
 logger = get_logger()
 
-NODES_START = "<Nodes>"
-NODES_END = "</Nodes>"
-GROUP_START = "<NodeGroup"
-GROUP_END = "</NodeGroup>"
-GMSH_START = "gmsh"
-COMMENT_STARTERS = ["//", "#"]
+NODES_LABEL = "Nodes"
+GROUP_LABEL = "NodeGroup"
 
 
-class NodeSet(IntegerIdDict):
+class NodeSet(IntegerIdIndex):
+    """
+    The nodes are stored as a struct of arrays: the coordinates of all nodes are kept in one contiguous
+    (number_of_nodes, rank) float array, and the dict maps each node id to its row in that array.
+
+    Node groups are stored as sorted integer arrays of node ids.
+
+    The modification counter goes up whenever nodes are added or their coordinates are changed, so that data which
+    is computed from the coordinates, such as the geometric data of the element groups, can detect changes without
+    keeping a copy of the coordinates. Coordinates must therefore be changed through set_node_coords.
+    """
 
     def __init__(self):
         super().__init__()
         self.rank: int = -1
-        self.groups: Dict[str, List[int]] = {}
+        self.groups: Dict[str, np.ndarray] = {}
+        self._coords: np.ndarray = np.empty(shape=(0, 0))
+        self._pending_coords: List[np.ndarray] = []
+        self._spatial_index = None
+        self._spatial_index_count = -1
+        self._modification_count = 0
 
     def __repr__(self) -> str:
         """
@@ -45,17 +58,114 @@ class NodeSet(IntegerIdDict):
 
         return str_
 
-    def get_node_coords(self, node_ids: Union[int, List[int]]) -> np.ndarray[float]:
+    @property
+    def coords(self) -> np.ndarray:
+        """
+        The contiguous (number_of_nodes, rank) array of node coordinates, ordered by row index.
+
+        Returns:
+            np.ndarray: The coordinate array.
+        """
+        if self._pending_coords:
+            self._coords = np.concatenate([self._coords.reshape(-1, self._pending_coords[0].shape[1])] +
+                                          self._pending_coords)
+            self._pending_coords = []
+        return self._coords
+
+    @property
+    def modification_count(self) -> int:
+        """
+        The number of times nodes have been added or node coordinates have been changed.
+
+        Returns:
+            int: The modification counter.
+        """
+        return self._modification_count
+
+    def add_item_by_id(self, node_id: int, coords: Union[List[float], np.ndarray]) -> None:
+        """
+        Add a node with the specified id and coordinates.
+
+        Parameters:
+            node_id (int): The id of the node.
+            coords (Union[List[float], np.ndarray]): The coordinates of the node.
+
+        Returns:
+            None
+        """
+        self.add_id(node_id)
+        self._pending_coords.append(np.array(coords, dtype=float).reshape(1, -1))
+        self._modification_count += 1
+
+    def add_items_by_ids(self, node_ids: Union[List[int], np.ndarray], coords: np.ndarray) -> None:
+        """
+        Add a block of nodes with the specified ids and coordinates at once.
+
+        Parameters:
+            node_ids (Union[List[int], np.ndarray]): The ids of the nodes.
+            coords (np.ndarray): The (len(node_ids), rank) array of node coordinates.
+
+        Returns:
+            None
+        """
+        self.add_ids(node_ids)
+        self._pending_coords.append(np.asarray(coords, dtype=float).reshape(len(node_ids), -1))
+        self._modification_count += 1
+
+    def set_node_coords(self, node_ids: Union[int, List[int], np.ndarray], coords: np.ndarray) -> None:
+        """
+        Change the coordinates of existing nodes.
+
+        Parameters:
+            node_ids (Union[int, List[int], np.ndarray]): The ids of the nodes.
+            coords (np.ndarray): The new coordinates of the nodes, one row per node.
+
+        Returns:
+            None
+        """
+        self.coords[self.get_indices_by_ids(node_ids)] = coords
+        self._modification_count += 1
+
+    def to_scratch(self, scratch: ScratchSpace) -> None:
+        """
+        Move the coordinate array to a memory-mapped file of the scratch space.
+
+        Parameters:
+            scratch (ScratchSpace): The scratch space.
+
+        Returns:
+            None
+        """
+        self._coords = scratch.array(self.coords)
+
+    def get_spatial_index(self) -> SpatialIndex:
+        """
+        Get a spatial index over the node coordinates for radius, box and nearest queries which return node ids.
+        The index is built on the first request and rebuilt when nodes have been added or node coordinates have
+        been changed.
+
+        Returns:
+            SpatialIndex: The spatial index of the undeformed node coordinates.
+        """
+        if self._spatial_index is None or self._spatial_index_count != self._modification_count:
+            self._spatial_index = SpatialIndex(self.coords, self.ids)
+            self._spatial_index_count = self._modification_count
+        return self._spatial_index
+
+    def get_node_coords(self, node_ids: Union[int, List[int], np.ndarray]) -> np.ndarray:
         """
         Given node ids, return the coordinates of the nodes in a numpy array.
 
+        A single id returns a view of the corresponding row of the coordinate array, a list or an array of ids
+        returns a fancy-indexed copy.
+
         Parameters:
-            node_ids (Union[int, List[int]]): The node ids for which to get the coordinates.
+            node_ids (Union[int, List[int], np.ndarray]): The node ids for which to get the coordinates.
 
         Returns:
             np.ndarray[float]: An array of node coordinates.
         """
-        return np.array(self.get_items_by_ids(node_ids))
+        return self.coords[self.get_indices_by_ids(node_ids)]
 
     def read_from_file(self, file_name: str) -> None:
         """
@@ -64,29 +174,31 @@ class NodeSet(IntegerIdDict):
         Parameters:
             file_name (str): The name of the file to read.
 
+        Returns:
+            None
+        """
+        self.read_from_dat(DatFile(file_name))
+
+    def read_from_dat(self, dat: DatFile) -> None:
+        """
+        Read the NodeSet object from an opened .dat file.
+
+        Parameters:
+            dat (DatFile): The .dat file with its sections and gmsh mesh.
+
         Returns:
             None
         """
         logger.info("Reading nodes ................")
 
-        with open(file_name, 'r') as f:
-            for line in f:
-                line = line.strip().replace(' ', '').replace('\n', '').replace('\t', '').replace('\r', '')
-                if line.startswith(GMSH_START):  # If the line starts with GMSH_START, read a Gmsh file
-                    clean_line = line.replace(';', '').replace('\"', '').replace('\'', '')
-                    gmsh_file_name = clean_line.split('=')[1]
-                    self.read_gmsh_file(gmsh_file_name)
-                elif line.startswith(NODES_START):  # If the line starts with NODES_START, read the node coordinates
-                    self.read_node_coords(f)
-                elif line.startswith(GROUP_START):  # If the line starts with GROUP_START, read a node group
-                    if 'name' in line:
-                        clean_line = line.replace('>', '').replace('\"', '').replace('\'', '')
-                        label = clean_line.split('=')[1]
-                        self.read_node_group(f, label)
-
-            # Remove duplicate entries in each group
-            for key in self.groups:
-                self.groups[key] = list(set(self.groups[key]))
+        if dat.mesh is not None:  # If the file refers to a Gmsh file, add the nodes of the Gmsh mesh
+            self.read_gmsh_mesh(dat.mesh)
+
+        for section in dat.sections:
+            if section.label == NODES_LABEL:  # Read the node coordinates of a <Nodes> section
+                self.read_node_coords(section.body)
+            elif section.label == GROUP_LABEL and section.name is not None:  # Read a named <NodeGroup> section
+                self.read_node_group(section.body, section.name)
 
     def read_gmsh_file(self, file_name: str) -> None:
         """
@@ -98,25 +210,35 @@ class NodeSet(IntegerIdDict):
         Returns:
             None
         """
-        mesh = meshio.read(file_name, file_format='gmsh')
+        self.read_gmsh_mesh(meshio.read(file_name, file_format='gmsh'))
+
+    def read_gmsh_mesh(self, mesh: meshio.Mesh) -> None:
+        """
+        Add the nodes and groups of a parsed Gmsh mesh to the NodeSet object.
+
+        Parameters:
+            mesh (meshio.Mesh): The mesh read by meshio.
+
+        Returns:
+            None
+        """
+        cell_sets = mesh.cell_sets_dict  # meshio rebuilds these dicts on every access
+        cells = mesh.cells_dict
         obj3d = ['pris', 'pyra', 'hexa', 'wedg', 'tetr']  # A list of 3D mesh types
         self.rank = 2  # Default rank is 2 (for 2D meshes)
-        for cell_set in mesh.cell_sets_dict:
-            for mesh_type in mesh.cell_sets_dict[cell_set]:
+        for cell_set in cell_sets:
+            for mesh_type in cell_sets[cell_set]:
                 if mesh_type[:4] in obj3d:
                     self.rank = 3  # If any 3D mesh type is found, set the rank to 3
-        for node_id, coords in enumerate(mesh.points):
-            self.add_item_by_id(node_id, coords[:self.rank])
-            # Add the node with id and coordinates to the NodeSet object
-        for cell_set in mesh.cell_sets_dict:
+        self.add_items_by_ids(np.arange(len(mesh.points)), mesh.points[:, :self.rank])
+        # Add the nodes with ids and coordinates to the NodeSet object
+        for cell_set in cell_sets:
             if cell_set == 'gmsh:bounding_entities':
                 pass
             else:
-                for mesh_type in mesh.cell_sets_dict[cell_set]:
-                    for id_ in mesh.cell_sets_dict[cell_set][mesh_type]:
-                        cell_nodes = mesh.cells_dict[mesh_type][id_]
-                        for node_id in cell_nodes:
-                            self.add_to_group_by_id(cell_set, node_id)  # Add each node to the appropriate group
+                # Take the nodes of all cells of the group block by block, duplicates are removed by numpy.unique
+                group_node_ids = [cells[mesh_type][ids].ravel() for mesh_type, ids in cell_sets[cell_set].items()]
+                self.add_to_group_by_ids(cell_set, np.concatenate(group_node_ids))
 
     def add_to_group_by_id(self, cell_set: str, node_id: int) -> None:
         """
@@ -129,60 +251,57 @@ class NodeSet(IntegerIdDict):
         Returns:
             None
         """
+        self.add_to_group_by_ids(cell_set, [node_id])
+
+    def add_to_group_by_ids(self, cell_set: str, node_ids: Union[List[int], np.ndarray]) -> None:
+        """
+        Add several nodes to a group. The group is kept as a sorted array of unique node ids.
+
+        Parameters:
+            cell_set (str): The name of the group.
+            node_ids (Union[List[int], np.ndarray]): The ids of the nodes to add.
+
+        Returns:
+            None
+        """
+        node_ids = np.asarray(node_ids, dtype=int)
         if cell_set not in self.groups:
-            self.groups[cell_set] = [int(node_id)]
+            self.groups[cell_set] = np.unique(node_ids)
         else:
-            self.groups[cell_set].append(int(node_id))
+            self.groups[cell_set] = np.union1d(self.groups[cell_set], node_ids)
 
-    def read_node_coords(self, f: TextIO) -> None:
+    def read_node_coords(self, body: str) -> None:
         """
-        Read the node coordinates from the file object f.
+        Read the node coordinates from the body of a <Nodes> section at once.
 
         Parameters:
-            f (TextIO): The file object to read.
+            body (str): The text between <Nodes> and </Nodes>.
 
         Returns:
             None
         """
-        while True:
-            line = f.readline().strip()  # Remove leading/trailing white space
-            if line.replace(' ', '').startswith(NODES_END):
-                # If the line starts with NODES_END, return from the function
-                return
+        node_ids, coords = parse_nodes(body)
 
-            items = [x for x in re.split(r';|\s', line) if x]  # Split the line into items
+        if len(node_ids) == 0:
+            return
 
-            first_item = items[0] if items else ''
-            if any(first_item.startswith(comment) for comment in COMMENT_STARTERS):
-                # If the line is a comment, skip it
-                continue
+        if self.rank == -1:
+            self.rank = coords.shape[1]
 
-            if items and items[0].isdigit():
-                # If the first item is a digit, add the node coordinates to the NodeSet object
-                if self.rank == -1:
-                    self.rank = len(items) - 1
-                self.add_item_by_id(int(items[0]), [float(crd) for crd in items[1:]])
+        self.add_items_by_ids(node_ids, coords)
 
-    def read_node_group(self, f: TextIO, key: str) -> None:
+    def read_node_group(self, body: str, key: str) -> None:
         """
-        Read a node group from the file object f with the given key.
+        Read a node group from the body of a <NodeGroup> section with the given key.
 
         Parameters:
-            f (TextIO): The file object to read.
-            key (str): The name of the group to add the node to.
+            body (str): The text between <NodeGroup name="key"> and </NodeGroup>.
+            key (str): The name of the group to add the nodes to.
 
         Returns:
             None
         """
-        while True:
-            line = f.readline()
-            if line.replace(' ', '').startswith(GROUP_END):
-                # If the line starts with GROUP_END, return from the function
-                return
-            items = line.split()
-            for item in items:
-                if item.isdigit():  # If the item can be translated to an integer, add it to the node group
-                    self.add_to_group_by_id(key, int(item))
+        self.add_to_group_by_ids(key, parse_node_group(body))
 
 
 if __name__ == "__main__":
@@ -9,7 +9,6 @@ class ContourWriter(BaseModule):
     def __init__(self, props, globdat):
 
         self.prefix = globdat.prefix
-        self.interval = 1
         self.k = 0
 
         BaseModule.__init__(self, props)
@@ -62,6 +62,10 @@ class GraphWriter(BaseModule):
 
         self.run(props, globdat)
 
+    def requiredOutput(self, globdat):
+
+        return [col.type for col in self.columndata]
+
     def run(self, props, globdat):
 
         a = []
@@ -74,7 +78,7 @@ class GraphWriter(BaseModule):
             elif hasattr(globdat, col.type):
                 b = getattr(globdat, col.type)
                 if type(b) is ndarray:
-                    if type(col.node) is list:
+                    if isinstance(col.node, (list, ndarray)):
                         data = 0.0
                         for nod in col.node:
                             data += b[globdat.dofs.get_dof_ids_by_type(int(nod), col.dof)]
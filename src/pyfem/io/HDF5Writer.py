@@ -93,7 +93,7 @@ class HDF5Writer(BaseModule):
         cdat.create_group("elementGroups")
 
         for key in globdat.elements.groups:
-            elementIDs = np.array(globdat.elements.get_indices_by_ids(globdat.elements.groups[key]), dtype=int)
+            elementIDs = np.array(globdat.elements.get_indices_by_ids(globdat.elements.groups[key].ids), dtype=int)
             cdat["elementGroups"].create_dataset(key, elementIDs.shape, dtype='i', data=elementIDs)
 
         cdat.create_group("nodes")
@@ -13,7 +13,6 @@ class MeshWriter(BaseModule):
         self.prefix = globdat.prefix
         self.elementGroup = "All"
         self.k = 0
-        self.interval = 1
         self.extraFields = []
         self.beam = False
         self.interface = False
@@ -1,4 +1,16 @@
+from pyfem.fem.Assembly import assembleNodalOutput
+
+
 class OutputManager:
+    """
+    Runs the output modules of the .pro file after each solver step.
+
+    The nodal output fields are recovered from the elements before the modules run, but only in the cycles in which
+    a module writes and only for the fields which the modules write. A module tells which fields it needs in a
+    cycle by a method requiredOutput(globdat), which returns a list of field names, an empty list if the module
+    writes no nodal output in the cycle, or None for all fields. BaseModule returns all fields in the cycles which
+    are a multiple of the interval of the module, and modules without this method get all fields in every cycle.
+    """
 
     def __init__(self, props, globdat):
 
@@ -23,5 +35,29 @@ class OutputManager:
 
     def run(self, props, globdat):
 
+        outputNames = self.getRequiredOutput(globdat)
+
+        if outputNames is None or len(outputNames) > 0:
+            assembleNodalOutput(props, globdat, outputNames)
+        else:
+            globdat.reset_nodal_output()
+
         for i, output in enumerate(self.outman):
             output.run(props, globdat)
+
+    def getRequiredOutput(self, globdat):
+
+        outputNames = set()
+
+        for output in self.outman:
+            if not hasattr(output, "requiredOutput"):
+                return None
+
+            required = output.requiredOutput(globdat)
+
+            if required is None:
+                return None
+
+            outputNames.update(required)
+
+        return outputNames
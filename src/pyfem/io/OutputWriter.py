@@ -19,6 +19,11 @@ class OutputWriter(BaseModule):
 
 
 
+    def requiredOutput(self, globdat):
+
+        # The output file is written in every cycle, whatever the interval
+        return None
+
     def run(self, props, globdat):
 
         logger.info("Writing output file ..........")
@@ -0,0 +1,207 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+import meshio
+import numpy as np
+
+COMMENT_PATTERN = re.compile(r'(//|#).*$', re.MULTILINE)
+OPEN_TAG_PATTERN = re.compile(r'<\s*(\w+)([^<>]*)>')
+NAME_PATTERN = re.compile(r'name\s*=\s*["\']?([^"\'>\s]+)')
+GMSH_PATTERN = re.compile(r'^[ \t]*gmsh\s*=\s*["\']?([^"\';\s]+)', re.MULTILINE)
+
+
+class DatSection:
+    """
+    A block of a .dat file enclosed by <label name="..."> and </label>.
+    """
+
+    def __init__(self, label: str, name: Optional[str], body: str) -> None:
+        self.label = label
+        self.name = name
+        self.body = body
+
+
+class DatFile:
+    """
+    A .dat input file which is read only once. The sections are found on first use, and the gmsh file the .dat
+    file refers to is parsed on first use and shared by all readers.
+    """
+
+    def __init__(self, file_name: str) -> None:
+        self.file_name = file_name
+
+        with open(file_name, 'r') as f:
+            self.text = f.read()
+
+        self.gmsh_file_name = get_gmsh_file_name(self.text)
+        self._sections = None
+        self._mesh = None
+
+    @property
+    def sections(self) -> List[DatSection]:
+        """
+        The sections of the .dat file in the order of appearance.
+        """
+        if self._sections is None:
+            self._sections = read_sections(self.text)
+        return self._sections
+
+    @property
+    def mesh(self) -> Optional[meshio.Mesh]:
+        """
+        The mesh of the gmsh file given in the .dat file, or None if the .dat file does not refer to a gmsh file.
+        """
+        if self._mesh is None and self.gmsh_file_name is not None:
+            self._mesh = meshio.read(self.gmsh_file_name, file_format='gmsh')
+        return self._mesh
+
+    def get_sections(self, label: str) -> List[DatSection]:
+        """
+        Get all sections with the given label.
+
+        :param label: the label of the sections, such as 'Nodes' or 'NodeConstraints'
+        :return: the sections in the order of appearance
+        """
+        return [section for section in self.sections if section.label == label]
+
+
+def strip_comments(text: str) -> str:
+    """
+    Remove the comments starting with '//' or '#' until the end of the line.
+
+    :param text: the text of a .dat file or of a part of it
+    :return: the text without comments
+    """
+    if '#' not in text and '//' not in text:
+        return text
+    return COMMENT_PATTERN.sub('', text)
+
+
+def read_sections(text: str) -> List[DatSection]:
+    """
+    Find all the sections of a .dat file in one pass over the whole buffer.
+
+    :param text: the text of a .dat file
+    :return: the sections in the order of appearance
+    """
+    text = strip_comments(text)
+    sections = []
+    position = 0
+
+    while True:
+        start = OPEN_TAG_PATTERN.search(text, position)
+        if start is None:
+            return sections
+
+        label = start.group(1)
+        end = re.compile(r'<\s*/\s*' + label + r'\s*>').search(text, start.end())
+        if end is None:
+            raise RuntimeError(f'Missing closing tag </{label}>')
+
+        name = NAME_PATTERN.search(start.group(2))
+        sections.append(DatSection(label, name.group(1) if name else None, text[start.end():end.start()]))
+        position = end.end()
+
+
+def get_gmsh_file_name(text: str) -> Optional[str]:
+    """
+    Get the name of the gmsh file given by the line gmsh = "file_name" in a .dat file.
+
+    :param text: the text of a .dat file
+    :return: the name of the gmsh file, or None if the .dat file does not refer to a gmsh file
+    """
+    if 'gmsh' not in text:
+        return None
+    match = GMSH_PATTERN.search(strip_comments(text))
+    return match.group(1) if match else None
+
+
+def parse_nodes(body: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse the body of a <Nodes> section with one node per line: node_id x y [z];
+
+    :param body: the text between <Nodes> and </Nodes>
+    :raises RuntimeError: if the lines do not all have the same number of coordinates
+    :return: the node ids and the (number_of_nodes, rank) array of coordinates
+    """
+    body = body.replace(';', ' ')
+    lines = [line for line in body.splitlines() if line.strip()]
+
+    if not lines:
+        return np.empty(0, dtype=int), np.empty(shape=(0, 0))
+
+    columns = len(lines[0].split())
+    values = np.array(body.split(), dtype=float)
+
+    if len(values) != columns * len(lines):
+        raise RuntimeError('All nodes in a <Nodes> section must have the same number of coordinates')
+
+    values = values.reshape(len(lines), columns)
+
+    return values[:, 0].astype(int), values[:, 1:]
+
+
+def parse_elements(body: str) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Parse the body of an <Elements> section with one element per line: element_id "group_name" node_ids;
+
+    If all elements have the same number of nodes, the whole block is converted at once. Otherwise the elements
+    are collected line by line and converted per group.
+
+    :param body: the text between <Elements> and </Elements>
+    :raises RuntimeError: if the elements of a group do not all have the same number of nodes
+    :return: a dict with, for each element group in the order of appearance, the element ids and the
+        (number_of_elements, number_of_element_nodes) connectivity array
+    """
+    body = body.replace('"', ' ').replace('\'', ' ').replace(';', '\n')
+    lines = [line for line in body.splitlines() if line.strip()]
+
+    if not lines:
+        return {}
+
+    columns = len(lines[0].split())
+    tokens = body.split()
+    names = np.array(tokens[1::columns])
+
+    if len(tokens) == columns * len(lines) and not np.any(np.char.isdigit(names)):
+        del tokens[1::columns]
+        try:
+            values = np.array(tokens, dtype=int).reshape(len(lines), columns - 1)
+        except ValueError:
+            values = None
+    else:
+        values = None
+
+    elements = {}
+
+    if values is not None:
+        group_names, first_index, inverse = np.unique(names, return_index=True, return_inverse=True)
+        for group_index in np.argsort(first_index):
+            group_values = values[inverse == group_index]
+            elements[str(group_names[group_index])] = (group_values[:, 0], group_values[:, 1:])
+        return elements
+
+    records = {}
+    for line in lines:
+        items = line.split()
+        if len(items) > 2:
+            records.setdefault(items[1], []).append(items[:1] + items[2:])
+
+    for group_name, group_records in records.items():
+        try:
+            group_values = np.array(group_records, dtype=int)
+        except ValueError:
+            raise RuntimeError(f'All elements in the element group {group_name} must have the same number of nodes')
+        elements[group_name] = (group_values[:, 0], group_values[:, 1:])
+
+    return elements
+
+
+def parse_node_group(body: str) -> np.ndarray:
+    """
+    Parse the body of a <NodeGroup> section which contains a list of node ids.
+
+    :param body: the text between <NodeGroup name="..."> and </NodeGroup>
+    :return: the node ids of the group
+    """
+    return np.array(body.replace(';', ' ').split(), dtype=int)
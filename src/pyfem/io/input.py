@@ -2,13 +2,19 @@ import argparse
 import os.path
 import pickle
 import sys
+from typing import Optional
 
 from pyfem.fem.Contact import Contact
 from pyfem.fem.DofSpace import DofSpace
 from pyfem.fem.ElementSet import ElementSet
 from pyfem.fem.NodeSet import NodeSet
+from pyfem.io.dat_reader import DatFile
+from pyfem.io.mesh_cache import get_cache_file_name, get_cache_key, load_mesh_cache, save_mesh_cache
+from pyfem.mesh.generator import read_mesh_props
+from pyfem.mesh.refinement import refine_uniformly
 from pyfem.utils.data_structures import Properties, GlobalData
-from pyfem.utils.logger import set_logger
+from pyfem.utils.logger import get_logger, set_logger
+from pyfem.utils.out_of_core import ScratchSpace
 from pyfem.utils.parser import file_parser
 
 
@@ -36,24 +42,28 @@ def input_reader():
     if out_file_name is not None:
         return props, data["globdat"]
 
-    input_file_name = props.input
-
     logger = set_logger(props)
 
-    nodes = NodeSet()
-    nodes.read_from_file(input_file_name)
-    logger.info(nodes)
-
-    elems = ElementSet(nodes, props)
-    elems.read_from_file(input_file_name)
-    logger.info(elems)
-
-    dofs = DofSpace(elems)
-    dofs.read_from_file(input_file_name)
-
-    globdat = GlobalData(nodes, elems, dofs)
+    # The input file and its gmsh mesh are read once and shared by all readers. With a mesh block in the .pro
+    # file, the input file is optional and only gives the constraints and the external forces.
+    dat = DatFile(props.input) if hasattr(props, 'input') else None
+
+    if getattr(props, 'meshCache', False) and dat is not None and not hasattr(props, 'mesh'):
+        cache_file_name = get_cache_file_name(props.input)
+        cache_key = get_cache_key(dat, props)
+        globdat = load_mesh_cache(cache_file_name, cache_key, props)
+        if globdat is None:
+            globdat = read_model(dat, props)
+            save_mesh_cache(cache_file_name, cache_key, globdat)
+        else:
+            logger.info(globdat.nodes)
+            logger.info(globdat.elements)
+    else:
+        globdat = read_model(dat, props)
 
-    globdat.read_from_file(input_file_name)
+    scratch = ScratchSpace.from_props(props)
+    if scratch is not None:
+        globdat.to_scratch(scratch)
 
     globdat.active = True
     globdat.prefix = os.path.splitext(inp_file_name)[0]
@@ -65,6 +75,39 @@ def input_reader():
     return props, globdat
 
 
+def read_model(dat: Optional[DatFile], props: Properties) -> GlobalData:
+    logger = get_logger()
+
+    nodes = NodeSet()
+    elems = ElementSet(nodes, props)
+
+    if hasattr(props, 'mesh'):  # The mesh block of the .pro file replaces the nodes and elements of the input file
+        read_mesh_props(nodes, elems, props.mesh)
+    else:
+        nodes.read_from_dat(dat)
+        elems.read_from_dat(dat)
+
+    if getattr(props, 'refine', 0) > 0:  # The number of uniform refinements of the mesh
+        refine_uniformly(nodes, elems, props.refine)
+
+    logger.info(nodes)
+    logger.info(elems)
+
+    dofs = DofSpace(elems)
+
+    if dat is None:
+        dofs.constraint = dofs.create_constrain()
+    else:
+        dofs.read_from_dat(dat)
+
+    globdat = GlobalData(nodes, elems, dofs)
+
+    if dat is not None:
+        globdat.read_from_dat(dat)
+
+    return globdat
+
+
 def get_arguments() -> tuple[str, str, list[str]]:
 
     # 创建一个 argparse 解析器对象
@@ -0,0 +1,203 @@
+import hashlib
+import importlib.util
+import os
+from typing import Optional
+
+import numpy as np
+from scipy.sparse import coo_matrix
+
+from pyfem.fem.Constraint import Constraint
+from pyfem.fem.DofSpace import DofSpace
+from pyfem.fem.ElementSet import ElementSet
+from pyfem.fem.NodeSet import NodeSet
+from pyfem.io.dat_reader import DatFile
+from pyfem.utils.data_structures import GlobalData, Properties
+from pyfem.utils.logger import get_logger
+
+logger = get_logger()
+
+CACHE_VERSION = 1
+
+
+def get_cache_file_name(input_file_name: str) -> str:
+    """
+    Get the name of the cache file which is stored next to the .dat file, e.g. rectangle.cache.npz for
+    rectangle.dat.
+
+    :param input_file_name: the name of the .dat file
+    :return: the name of the cache file
+    """
+    return os.path.splitext(input_file_name)[0] + '.cache.npz'
+
+
+def get_cache_key(dat: DatFile, props: Properties) -> str:
+    """
+    Compute the key of the preprocessed model. The key is a hash of the content of the .dat file, of the gmsh file
+    it refers to, of the element groups of the .pro file with their element types, which decide the groups that
+    are read and the dof types, and of the number of uniform refinements. Changing any of them invalidates the
+    cache, whereas changing for example the material parameters or the solver does not.
+
+    :param dat: the opened .dat file
+    :param props: the properties of the .pro file
+    :return: the hexadecimal hash
+    """
+    sha = hashlib.sha1()
+    sha.update(f'version={CACHE_VERSION};'.encode())
+    sha.update(dat.text.encode())
+
+    if dat.gmsh_file_name is not None:
+        with open(dat.gmsh_file_name, 'rb') as f:
+            sha.update(f.read())
+
+    for name, value in props:
+        element_type = getattr(value, 'type', None) if isinstance(value, Properties) else None
+        if isinstance(element_type, str) and importlib.util.find_spec('pyfem.elements.' + element_type) is not None:
+            sha.update(f'{name}={element_type};'.encode())
+
+    sha.update(f'refine={getattr(props, "refine", 0)};'.encode())
+
+    return sha.hexdigest()
+
+
+def save_mesh_cache(file_name: str, key: str, globdat: GlobalData) -> None:
+    """
+    Save the nodes, the element connectivity, the groups, the dof table, the constraints and the external forces
+    of a model to an .npz file. The file is written under a temporary name first, so that runs which start at the
+    same time never see a partially written cache.
+
+    :param file_name: the name of the cache file
+    :param key: the key of the model, see get_cache_key
+    :param globdat: the global data of the model which has just been read
+    """
+    nodes = globdat.nodes
+    elements = globdat.elements
+    dofs = globdat.dofs
+
+    arrays = {
+        'key': np.array(key),
+        'node_ids': nodes.ids,
+        'node_coords': nodes.coords,
+        'rank': np.array(nodes.rank),
+        'node_group_names': np.array(list(nodes.groups), dtype=str),
+        'element_group_names': np.array(list(elements.groups), dtype=str),
+        'dof_types': np.array(dofs.dof_types, dtype=str),
+        'dofs': dofs.dofs,
+        'fhat': globdat.fhat,
+    }
+
+    for name, node_ids in nodes.groups.items():
+        arrays[f'node_group/{name}'] = node_ids
+
+    for name, group in elements.groups.items():
+        arrays[f'element_group/{name}/ids'] = group.ids
+        arrays[f'element_group/{name}/connectivity'] = group.connectivity
+
+    arrays.update(_pack_constraint(dofs.constraint))
+
+    temp_file_name = f'{file_name}.{os.getpid()}.tmp.npz'
+    np.savez(temp_file_name, **arrays)
+    os.replace(temp_file_name, file_name)
+
+    logger.info("Writing mesh cache ...........")
+
+
+def load_mesh_cache(file_name: str, key: str, props: Properties) -> Optional[GlobalData]:
+    """
+    Load a model from an .npz cache file.
+
+    :param file_name: the name of the cache file
+    :param key: the key of the model, see get_cache_key
+    :param props: the properties of the .pro file
+    :return: the global data of the model, or None if there is no cache file or if it belongs to another model
+    """
+    if not os.path.isfile(file_name):
+        return None
+
+    with np.load(file_name) as data:
+        if str(data['key']) != key:
+            return None
+
+        logger.info("Reading mesh cache ...........")
+
+        nodes = NodeSet()
+        nodes.rank = int(data['rank'])
+        nodes.add_items_by_ids(data['node_ids'], data['node_coords'])
+        for name in data['node_group_names']:
+            nodes.groups[str(name)] = data[f'node_group/{name}']
+
+        elements = ElementSet(nodes, props)
+        for name in data['element_group_names']:
+            elements.add_items_by_element_ids(str(name), data[f'element_group/{name}/ids'],
+                                              data[f'element_group/{name}/connectivity'])
+
+        dofs = DofSpace(elements)
+        if dofs.dof_types != data['dof_types'].tolist() or not np.array_equal(dofs.dofs, data['dofs']):
+            return None
+        dofs.constraint = _unpack_constraint(data, dofs.number_of_dofs)
+
+        globdat = GlobalData(nodes, elements, dofs)
+        globdat.fhat[:] = data['fhat']
+
+    return globdat
+
+
+def _pack_constraint(constraint: Constraint) -> dict:
+    labels = list(constraint.constrained_dofs)
+
+    arrays = {
+        'constraint_labels': np.array(labels, dtype=str),
+        'constraint_factors': np.array([constraint.constrained_factors[label] for label in labels], dtype=float),
+    }
+
+    for label in labels:
+        arrays[f'constraint/{label}/dofs'] = np.array(constraint.constrained_dofs[label], dtype=int)
+        arrays[f'constraint/{label}/values'] = np.array(constraint.constrained_values[label], dtype=float)
+
+    # Every item of constrainData is either a prescribed value or a tie [value, master_dof, factor], which is
+    # stored with a master dof of -1 for prescribed values
+    data_dofs, data_values, data_masters, data_factors = [], [], [], []
+    for dof_id, items in constraint.constrainData.items():
+        for item in items:
+            data_dofs.append(dof_id)
+            if isinstance(item, list):
+                data_values.append(item[0])
+                data_masters.append(int(np.ravel(item[1])[0]))
+                data_factors.append(item[2])
+            else:
+                data_values.append(item)
+                data_masters.append(-1)
+                data_factors.append(0.0)
+
+    arrays['constraint_data_dofs'] = np.array(data_dofs, dtype=int)
+    arrays['constraint_data_values'] = np.array(data_values, dtype=float)
+    arrays['constraint_data_masters'] = np.array(data_masters, dtype=int)
+    arrays['constraint_data_factors'] = np.array(data_factors, dtype=float)
+
+    arrays['constraint_row'] = constraint.C.row
+    arrays['constraint_col'] = constraint.C.col
+    arrays['constraint_val'] = constraint.C.data
+    arrays['constraint_shape'] = np.array(constraint.C.shape)
+
+    return arrays
+
+
+def _unpack_constraint(data, number_of_dofs: int) -> Constraint:
+    constraint = Constraint(number_of_dofs)
+
+    for label, factor in zip(data['constraint_labels'], data['constraint_factors']):
+        label = str(label)
+        constraint.constrained_dofs[label] = data[f'constraint/{label}/dofs'].tolist()
+        constraint.constrained_values[label] = data[f'constraint/{label}/values'].tolist()
+        constraint.constrained_factors[label] = float(factor)
+
+    for dof_id, value, master, factor in zip(data['constraint_data_dofs'].tolist(),
+                                             data['constraint_data_values'].tolist(),
+                                             data['constraint_data_masters'].tolist(),
+                                             data['constraint_data_factors'].tolist()):
+        item = value if master < 0 else [value, np.array([master]), factor]
+        constraint.constrainData.setdefault(dof_id, []).append(item)
+
+    constraint.C = coo_matrix((data['constraint_val'], (data['constraint_row'], data['constraint_col'])),
+                              shape=tuple(data['constraint_shape']))
+
+    return constraint
@@ -0,0 +1,58 @@
+from numpy import array, newaxis
+
+# The output labels of the stress components, in the order of the Voigt notation of the materials
+STRESS_LABELS = ["S11", "S22", "S33", "S23", "S13", "S12"]
+
+
+class BaseFailure:
+    """
+    A failure criterion, which is selected per material in the .pro file, e.g.
+
+      material =
+      {
+        type        = "PlaneStrain";
+        ...
+        failureType = "VonMises";
+        smax        = 250.;
+      };
+
+    The failure indices are evaluated once per converged step by the element group, from the stresses in the
+    output data of the material points. A point with an index of one or more has failed.
+    """
+
+    outLabel = "FI"
+
+    def __init__(self, props):
+
+        for name, val in props:
+            setattr(self, name, val)
+
+    def check(self, stress, deformation):
+        """
+        :param stress: the stress of a material point
+        :param deformation: the kinematics of the point
+        :return: the failure index of the point
+        """
+        return self.getFailureIndices(array(stress, dtype=float)[newaxis])[0]
+
+    def getFailureIndices(self, stresses):
+        """
+        Failure criteria override this with a vectorized evaluation.
+
+        :param stresses: the (number_of_points, number_of_stresses) array of stresses
+        :return: the failure indices of the points
+        """
+        raise NotImplementedError(f"The failure criterion {type(self).__name__} does not implement "
+                                  f"getFailureIndices")
+
+    def getStressColumns(self, labels):
+        """
+        :param labels: the output labels of a material
+        :return: the columns of the stress components in the output data, or None if the output has no stresses
+        """
+        columns = [labels.index(label) for label in STRESS_LABELS if label in labels]
+
+        if len(columns) not in (3, 6):
+            return None
+
+        return columns
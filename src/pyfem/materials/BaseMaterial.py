@@ -1,18 +1,34 @@
-import copy
+from numpy import array, empty, result_type, zeros
 
-from numpy import zeros
+from pyfem.utils.kinematics import Kinematics
 
 
 class BaseMaterial:
 
+    # Materials which compute their stresses by complex analytic operations only set this to allow the complex-step
+    # numerical tangent
+    supportsComplexStep = False
+
+    # Materials with an elastic tangent which implement getElasticStresses set this, so that the points of the
+    # elements which behaved elastically are updated by the elastic trial instead of being evaluated
+    supportsElasticTrial = False
+
     def __init__(self, props):
 
         self.numericalTangent = False
+        self.perturbation = 1.0e-9
+        self.complexStep = False
         self.storeOutputFlag = False
+        self.traceFile = None
+        self.traceElements = None
+        self.tracePoints = None
 
         for name, val in props:
             setattr(self, name, val)
 
+        # The MaterialTrace of the points, which the material points set if traceFile is set
+        self.trace = None
+
         self.oldHistory = {}
         self.newHistory = {}
 
@@ -33,7 +49,92 @@ class BaseMaterial:
 
     def commit_history(self):
 
-        self.oldHistory = copy.deepcopy(self.newHistory)
+        # getHistoryParameter returns copies and setHistoryParameter replaces the values, so the committed and the
+        # new history can share the values
+        self.oldHistory = dict(self.newHistory)
+
+    def getStresses(self, strain, dstrain, history):
+        """
+        Compute the stresses and the tangents of many material points at once. The points share the parameters of
+        this material, their history is passed as arrays with one row per point.
+
+        This implementation evaluates getStress point by point and leaves the history of the material object
+        itself unchanged. Materials override it with a vectorized version.
+
+        :param strain: the (number_of_points, number_of_strains) array of strains
+        :param dstrain: the (number_of_points, number_of_strains) array of strain increments of the step
+        :param history: a dict with the committed history of the points, one row per point
+        :return: the stresses, the tangents, a dict with the new history and the output data, all stacked by point
+        """
+        n, nstr = strain.shape
+
+        # The strains are complex for the complex-step numerical tangent
+        dtype = result_type(strain, dstrain, float)
+
+        sigma = empty(shape=(n, nstr), dtype=dtype)
+        tang = empty(shape=(n, nstr, nstr), dtype=dtype)
+        newHistory = {name: empty(values.shape, dtype=dtype) for name, values in history.items()}
+        outData = empty(shape=(n, len(self.outLabels)), dtype=dtype)
+
+        oldHistory, currentHistory = self.oldHistory, self.newHistory
+
+        kinematics = Kinematics(3 if nstr == 6 else 2, nstr)
+
+        for i in range(n):
+            self.oldHistory = {name: values[i] for name, values in history.items()}
+            self.newHistory = {}
+
+            kinematics.strain = strain[i]
+            kinematics.dstrain = dstrain[i]
+
+            sigma[i], tang[i] = self.getStress(kinematics)
+
+            for name in history:
+                newHistory[name][i] = self.newHistory.get(name, history[name][i])
+
+            outData[i] = self.outData
+
+        self.oldHistory, self.newHistory = oldHistory, currentHistory
+
+        return sigma, tang, newHistory, outData
+
+    def getConstantTangent(self):
+        """
+        Linear materials without history return their tangent, which element kernels can use to precompute the
+        element stiffness matrices. The output data of such materials must be their stresses.
+
+        :return: the constant tangent, or None if the tangent depends on the state of the points
+        """
+        return None
+
+    def getElasticTangent(self):
+        """
+        Materials which return exactly this tangent for the points which behave elastically allow element kernels
+        to reuse the elastic stiffness matrices of the elements without plastic points.
+
+        :return: the elastic tangent, or None
+        """
+        return self.getConstantTangent()
+
+    def getElasticStresses(self, strain, dstrain, history):
+        """
+        Compute the elastic trial state of many material points, i.e. the state if the step is elastic, and check
+        whether it is admissible. For the admissible points the result must equal the one of getStresses, with the
+        elastic tangent as the tangent.
+
+        :param strain: the (number_of_points, number_of_strains) array of strains
+        :param dstrain: the (number_of_points, number_of_strains) array of strain increments of the step
+        :param history: a dict with the committed history of the points, one row per point
+        :return: the stresses, a dict with the new values of all history variables, the output data and a boolean
+            array which is True for the points whose trial state is admissible
+        """
+        raise NotImplementedError(f"The material {type(self).__name__} does not implement getElasticStresses")
+
+    def getInitialHistory(self):
+        """
+        :return: a dict with the history of a new material point
+        """
+        return {name: array(value, dtype=float) for name, value in self.oldHistory.items()}
 
     def setOutputLabels(self, labels):
 
@@ -0,0 +1,99 @@
+import numpy as np
+
+
+class HistoryStore:
+    """
+    The history of a set of material points, stored per history variable as one array with a row per point in two
+    buffers: the committed values of the last converged step and the trial values of the current step.
+
+    Committing swaps the buffers of the variables which have been set since the last commit, and rolling back
+    copies the committed values into the trial buffers. The trial values of a variable are therefore expected to
+    be set for all points between two commits, as they are by the evaluation of all elements of a group.
+    """
+
+    def __init__(self, initial, shape, empty=np.empty):
+        """
+        :param initial: a dict with the history of a new material point
+        :param shape: the shape of the leading axes of the arrays, e.g. (number_of_elements, points_per_element)
+        :param empty: the function which allocates the arrays, e.g. the one of a scratch space
+        """
+        self.shape = tuple(shape)
+
+        self._committed = {}
+        self._trial = {}
+        self._modified = set()
+
+        for name, value in initial.items():
+            value = np.asarray(value, dtype=float)
+
+            self._committed[name] = empty(self.shape + value.shape, dtype=float)
+            self._committed[name][:] = value
+            self._trial[name] = empty(self.shape + value.shape, dtype=float)
+            self._trial[name][:] = value
+
+    def __contains__(self, name):
+        return name in self._committed
+
+    def __iter__(self):
+        return iter(self._committed)
+
+    @property
+    def committed(self):
+        """
+        :return: a dict with the arrays of committed values
+        """
+        return self._committed
+
+    @property
+    def trial(self):
+        """
+        :return: a dict with the arrays of trial values, which equal the committed values for the variables which
+            have not been set since the last commit
+        """
+        return {name: self._trial[name] if name in self._modified else values
+                for name, values in self._committed.items()}
+
+    @property
+    def buffers(self):
+        """
+        :return: the dicts of committed and trial buffers, e.g. for other processes which set the trial values in
+            place, after which set_in_place must be called for the variables which they have set
+        """
+        return self._committed, self._trial
+
+    def set_in_place(self, name):
+        """
+        Mark the trial values of a history variable as set in its trial buffer.
+
+        :param name: the name of the history variable
+        """
+        self._modified.add(name)
+
+    def set(self, name, index, values):
+        """
+        Set the trial values of a history variable.
+
+        :param name: the name of the history variable
+        :param index: the index of the points along the leading axes, e.g. a slice of elements
+        :param values: the values of the points
+        """
+        self._trial[name][index] = values
+        self._modified.add(name)
+
+    def commit(self):
+        """
+        Accept the trial values by swapping the buffers of the variables which have been set.
+        """
+        for name in self._modified:
+            self._committed[name], self._trial[name] = self._trial[name], self._committed[name]
+
+        self._modified.clear()
+
+    def rollback(self):
+        """
+        Discard the trial values, e.g. to restart a step.
+        """
+        for name in self._modified:
+            self._trial[name][:] = self._committed[name]
+
+        self._modified.clear()
@@ -1,9 +1,10 @@
-from numpy import zeros, dot
+from numpy import zeros, dot, broadcast_to
 
 from pyfem.materials.BaseMaterial import BaseMaterial
 
 
 class Isotropic(BaseMaterial):
+    supportsComplexStep = True
 
     def __init__(self, props):
 
@@ -54,6 +55,22 @@ class Isotropic(BaseMaterial):
 
         return sigma, self.H
 
+    def getStresses(self, strain, dstrain, history):
+
+        if self.incremental:
+            sigma = history['sigma'] + dstrain @ self.H.T
+            newHistory = {'sigma': sigma}
+        else:
+            sigma = strain @ self.H.T
+            newHistory = {}
+
+        return sigma, broadcast_to(self.H, (len(strain),) + self.H.shape), newHistory, sigma
+
     def getTangent(self):
 
         return self.H
+
+    def getConstantTangent(self):
+
+        # The incremental variant keeps the stresses as history
+        return None if self.incremental else self.H
@@ -2,11 +2,14 @@
 
 from pyfem.materials.BaseMaterial import BaseMaterial
 from pyfem.materials.MatUtils     import vonMisesStress,hydrostaticStress,Hardening
-from numpy import zeros, ones, dot, array, outer
+from pyfem.materials.MatUtils     import vonMisesStresses,hydrostaticStresses
+from numpy import zeros, ones, dot, array, outer, repeat, newaxis, arange, flatnonzero
 from math import sqrt
 
 class IsotropicHardeningPlasticity( BaseMaterial ):
 
+  supportsElasticTrial = True
+
   def __init__ ( self, props ):
 
     self.tolerance = 1.0e-6
@@ -65,9 +68,7 @@ class IsotropicHardeningPlasticity( BaseMaterial ):
 
     smises = vonMisesStress( sigma )
 
-    syield , hard = self.hardLaw.getHardening( eqplas )
-
-    print(syield,eqplas)
+    syield , hard = self.hardLaw.getHardening( eqplas[0] )
 
     if smises > ( 1.0 + self.tolerance ) * syield:
 
@@ -89,21 +90,19 @@ class IsotropicHardeningPlasticity( BaseMaterial ):
 
         k = k+1
 
-        if k > 10:
-          printf("rrrr")
+        if k > 100:
+          raise RuntimeError("The return mapping of IsotropicHardeningPlasticity did not converge")
 
         rhs   = smises-self.eg3*deqpl - syield
         deqpl = deqpl+rhs/(self.eg3+hard)
 
-        syield , hard = self.hardLaw.getHardening( eqplas + deqpl )
- 
-        print("SS",syield,eqplas+deqpl)
+        syield , hard = self.hardLaw.getHardening( eqplas[0] + deqpl )
 
       eplas[:3] +=  1.5 * flow[:3] * deqpl
       eelas[:3] += -1.5 * flow[:3] * deqpl
 
-      eplas[3:] +=  3.0 * flow[:3] * deqpl
-      eelas[3:] += -3.0 * flow[:3] * deqpl
+      eplas[3:] +=  3.0 * flow[3:] * deqpl
+      eelas[3:] += -3.0 * flow[3:] * deqpl
 
       sigma = flow * syield
       sigma[:3] += shydro * ones(3)
@@ -116,8 +115,9 @@ class IsotropicHardeningPlasticity( BaseMaterial ):
       effg2  = 2.0*effg
       effg3  = 3.0*effg
       efflam = 1.0/3.0 * ( self.ebulk3-effg2 )
-      effhdr = self.eg3 * self.hard/(self.eg3+self.hard)-effg3
-     
+      effhdr = self.eg3 * hard/(self.eg3+hard)-effg3
+
+      tang = zeros(shape=(6,6))
       tang[:3,:3] = efflam
     
       for i in range(3):
@@ -134,7 +134,142 @@ class IsotropicHardeningPlasticity( BaseMaterial ):
     # Store output eplas
 
     self.outData[:6] = sigma
-    self.outData[6]  = eqplas
+    self.outData[6]  = eqplas[0]
 
-    return sigma , tang           
- 
+    return sigma , tang
+
+#------------------------------------------------------------------------------
+#  The tangent of the elastic points
+#------------------------------------------------------------------------------
+
+  def getElasticTangent( self ):
+
+    return self.ctang
+
+#------------------------------------------------------------------------------
+#  pre:  stacked strains and strain increments, history arrays of the points
+#  post: stacked elastic trial stresses, new history, output data and the
+#        points for which they are admissible
+#------------------------------------------------------------------------------
+
+  def getElasticStresses( self, strain, dstrain, history ):
+
+    sigma = history['sigma'] + dstrain @ self.ctang.T
+
+    syield , hard = self.hardLaw.getHardening( history['eqplas'][:,0] )
+
+    elastic = vonMisesStresses( sigma ) <= ( 1.0 + self.tolerance ) * syield
+
+    newHistory = { 'eelas' : history['eelas'] + dstrain , 'eplas' : history['eplas'] ,
+                   'sigma' : sigma , 'eqplas' : history['eqplas'] }
+
+    outData = zeros(shape=(len(sigma),7))
+    outData[:,:6] = sigma
+    outData[:,6]  = history['eqplas'][:,0]
+
+    return sigma , newHistory , outData , elastic
+
+#------------------------------------------------------------------------------
+#  pre:  stacked strains and strain increments, history arrays of the points
+#  post: stacked stresses and tangents, new history, output data
+#        The return mapping iterates on all yielding points at once
+#        The trace records the trial state of the points ("trial": von Mises
+#        stress, yield stress, equivalent plastic strain) and every iteration
+#        of the return mapping ("return": iteration, residual, plastic
+#        multiplier, yield stress)
+#------------------------------------------------------------------------------
+
+  def getStresses( self, strain, dstrain, history ):
+
+    eelas  = history['eelas'] + dstrain
+    eplas  = history['eplas'].copy()
+    eqplas = history['eqplas'].copy()
+    sigma  = history['sigma'] + dstrain @ self.ctang.T
+
+    tang = repeat( self.ctang[newaxis] , len(sigma) , axis=0 )
+
+    smises = vonMisesStresses( sigma )
+
+    syield , hard = self.hardLaw.getHardening( eqplas[:,0] )
+
+    yielding = smises > ( 1.0 + self.tolerance ) * syield
+
+    if self.trace is not None:
+      self.trace.write( "trial" , ( smises , syield , eqplas[:,0] ) )
+
+    if yielding.any():
+      smises = smises[yielding]
+      shydro = hydrostaticStresses( sigma[yielding] )
+      eqpl0  = eqplas[yielding,0]
+      hard   = hard[yielding]
+
+      flow = sigma[yielding]
+
+      flow[:,:3] -= shydro[:,newaxis]
+      flow *= ( 1.0/smises )[:,newaxis]
+
+      syield = self.syield0 * ones(len(smises))
+
+      deqpl  = zeros(len(smises))
+      active = ones(len(smises),dtype=bool)
+
+      if self.trace is not None:
+        rows = flatnonzero( yielding )
+
+      k = 0
+
+      while active.any():
+
+        k = k+1
+
+        if k > 100:
+          raise RuntimeError("The return mapping of IsotropicHardeningPlasticity did not converge")
+
+        rhs = smises[active] - self.eg3*deqpl[active] - syield[active]
+
+        deqpl[active] += rhs/(self.eg3+hard[active])
+
+        syield[active] , hard[active] = self.hardLaw.getHardening( eqpl0[active] + deqpl[active] )
+
+        if self.trace is not None:
+          self.trace.write( "return" , ( k , rhs , deqpl[active] , syield[active] ) , rows[active] )
+
+        active[active] = abs(rhs) > self.tolerance * self.syield0
+
+      deqpl = deqpl[:,newaxis]
+
+      eplas[yielding,:3] +=  1.5 * flow[:,:3] * deqpl
+      eelas[yielding,:3] += -1.5 * flow[:,:3] * deqpl
+
+      eplas[yielding,3:] +=  3.0 * flow[:,3:] * deqpl
+      eelas[yielding,3:] += -3.0 * flow[:,3:] * deqpl
+
+      sigma[yielding] = flow * syield[:,newaxis]
+      sigma[yielding,:3] += shydro[:,newaxis]
+
+      eqplas[yielding] += deqpl
+
+      effg   = self.eg*syield / smises
+      effg2  = 2.0*effg
+      effg3  = 3.0*effg
+      efflam = 1.0/3.0 * ( self.ebulk3-effg2 )
+      effhdr = self.eg3 * hard/(self.eg3+hard)-effg3
+
+      ytang = zeros(shape=(len(smises),6,6))
+      ytang[:,:3,:3] = efflam[:,newaxis,newaxis]
+
+      diag = arange(3)
+      ytang[:,diag,diag]     += effg2[:,newaxis]
+      ytang[:,diag+3,diag+3] += effg[:,newaxis]
+
+      ytang += effhdr[:,newaxis,newaxis]*flow[:,:,newaxis]*flow[:,newaxis,:]
+
+      tang[yielding] = ytang
+
+    newHistory = { 'eelas' : eelas , 'eplas' : eplas , 'sigma' : sigma , 'eqplas' : eqplas }
+
+    outData = zeros(shape=(len(sigma),7))
+    outData[:,:6] = sigma
+    outData[:,6]  = eqplas[:,0]
+
+    return sigma , tang , newHistory , outData
@@ -3,11 +3,15 @@
 from pyfem.materials.BaseMaterial import BaseMaterial
 from pyfem.materials.MatUtils     import vonMisesStress,hydrostaticStress
 from pyfem.materials.MatUtils     import transform3To2,transform2To3
-from numpy import zeros, ones, dot, array, outer
+from pyfem.materials.MatUtils     import vonMisesStresses,hydrostaticStresses
+from pyfem.materials.MatUtils     import transforms2To3,PLANE_COMPONENTS
+from numpy import zeros, ones, dot, array, outer, repeat, newaxis, arange
 from math import sqrt
 
 class IsotropicKinematicHardening( BaseMaterial ):
 
+  supportsElasticTrial = True
+
   def __init__ ( self, props ):
 
     self.tolerance = 1.0e-6
@@ -31,6 +35,8 @@ class IsotropicKinematicHardening( BaseMaterial ):
     self.ctang[3,3] = self.eg
     self.ctang[4,4] = self.ctang[3,3]
     self.ctang[5,5] = self.ctang[3,3]
+
+    self.ptang = self.ctang[PLANE_COMPONENTS][:,PLANE_COMPONENTS]
  
     self.setHistoryParameter( 'sigma', zeros(6) )
     self.setHistoryParameter( 'eelas', zeros(6) )
@@ -119,5 +125,124 @@ class IsotropicKinematicHardening( BaseMaterial ):
       return sigma , tang  
     else:
       return transform3To2(sigma,tang)
-         
- 
+
+#------------------------------------------------------------------------------
+#  The tangent of the elastic points, in the strain components of the rank
+#------------------------------------------------------------------------------
+
+  def getElasticTangent( self ):
+
+    if self.rank == 3:
+      return self.ctang
+    else:
+      return self.ptang
+
+#------------------------------------------------------------------------------
+#  pre:  stacked strains and strain increments, history arrays of the points
+#  post: stacked elastic trial stresses, new history, output data and the
+#        points for which they are admissible
+#------------------------------------------------------------------------------
+
+  def getElasticStresses( self, strain, dstrain, history ):
+
+    plane = dstrain.shape[1] == 3
+
+    if plane:
+      sigma = history['sigma'] + dstrain @ self.ctang[:,PLANE_COMPONENTS].T
+      eelas = history['eelas'].copy()
+      eelas[:,PLANE_COMPONENTS] += dstrain
+    else:
+      sigma = history['sigma'] + dstrain @ self.ctang.T
+      eelas = history['eelas'] + dstrain
+
+    elastic = vonMisesStresses( sigma - history['alpha'] ) <= ( 1.0 + self.tolerance ) * self.syield
+
+    newHistory = { 'eelas' : eelas , 'eplas' : history['eplas'] , 'alpha' : history['alpha'] , 'sigma' : sigma }
+
+    outData = zeros(shape=(len(sigma),7))
+    outData[:,:6] = sigma
+    outData[:,6]  = history['eplas'][:,0]
+
+    if plane:
+      return sigma[:,PLANE_COMPONENTS] , newHistory , outData , elastic
+    else:
+      return sigma , newHistory , outData , elastic
+
+#------------------------------------------------------------------------------
+#  pre:  stacked strains and strain increments, history arrays of the points
+#  post: stacked stresses and tangents, new history, output data
+#        The radial return is done at once for all yielding points, the
+#        tangents of the other points are the elastic tangent
+#------------------------------------------------------------------------------
+
+  def getStresses( self, strain, dstrain, history ):
+
+    plane = dstrain.shape[1] == 3
+
+    if plane:
+      dstrain = transforms2To3(dstrain)
+    else:
+      dstrain = dstrain.copy()
+
+    eelas = history['eelas'] + dstrain
+    eplas = history['eplas'].copy()
+    alpha = history['alpha'].copy()
+    sigma = history['sigma'] + dstrain @ self.ctang.T
+
+    tang = repeat( ( self.ptang if plane else self.ctang )[newaxis] , len(sigma) , axis=0 )
+
+    smises = vonMisesStresses( sigma - alpha )
+
+    yielding = smises > ( 1.0 + self.tolerance ) * self.syield
+
+    if yielding.any():
+      smises = smises[yielding]
+      shydro = hydrostaticStresses( sigma[yielding] )
+
+      flow = sigma[yielding] - alpha[yielding]
+
+      flow[:,:3] -= shydro[:,newaxis]
+      flow *= ( 1.0/smises )[:,newaxis]
+
+      deqpl = ( ( smises - self.syield ) / ( self.eg3 + self.hard ) )[:,newaxis]
+
+      alpha[yielding] += self.hard * flow * deqpl
+      eplas[yielding,:3] +=  1.5 * flow[:,:3] * deqpl
+      eelas[yielding,:3] += -1.5 * flow[:,:3] * deqpl
+
+      eplas[yielding,3:] +=  3.0 * flow[:,3:] * deqpl
+      eelas[yielding,3:] += -3.0 * flow[:,3:] * deqpl
+
+      sigma[yielding] = alpha[yielding] + flow * self.syield
+      sigma[yielding,:3] += shydro[:,newaxis]
+
+      effg   = self.eg*(self.syield + self.hard*deqpl[:,0] ) / smises
+      effg2  = 2.0*effg
+      effg3  = 3.0*effg
+      efflam = 1.0/3.0 * ( self.ebulk3-effg2 )
+      effhdr = self.eg3 * self.hard/(self.eg3+self.hard)-effg3
+
+      ytang = zeros(shape=(len(smises),6,6))
+      ytang[:,:3,:3] = efflam[:,newaxis,newaxis]
+
+      diag = arange(3)
+      ytang[:,diag,diag]     += effg2[:,newaxis]
+      ytang[:,diag+3,diag+3] += effg[:,newaxis]
+
+      ytang += effhdr[:,newaxis,newaxis]*flow[:,:,newaxis]*flow[:,newaxis,:]
+
+      if plane:
+        tang[yielding] = ytang[:,PLANE_COMPONENTS][:,:,PLANE_COMPONENTS]
+      else:
+        tang[yielding] = ytang
+
+    newHistory = { 'eelas' : eelas , 'eplas' : eplas , 'alpha' : alpha , 'sigma' : sigma }
+
+    outData = zeros(shape=(len(sigma),7))
+    outData[:,:6] = sigma
+    outData[:,6]  = eplas[:,0]
+
+    if plane:
+      return sigma[:,PLANE_COMPONENTS] , tang , newHistory , outData
+    else:
+      return sigma , tang , newHistory , outData
@@ -1,6 +1,11 @@
-from numpy import dot,zeros,insert,array,ones
+from numpy import dot,zeros,insert,array,ones,sqrt as sqrts
+from numpy import asarray,clip,diff,floor,searchsorted
 from math import sqrt
 
+from pyfem.utils.logger import get_logger
+
+logger = get_logger()
+
 def vonMisesStress( s ):
 
   smises = 0.;
@@ -19,8 +24,37 @@ def hydrostaticStress( s ):
 
   return 0.333333333333333*sum( s[:3] );
 
+#------------------------------------------------------------------------------
+#  vonMisesStresses, hydrostaticStresses: the same for the rows of an
+#  (n,6) array of stresses, or of an (n,3) array for vonMisesStresses
+#------------------------------------------------------------------------------
+
+def vonMisesStresses( s ):
+
+  if s.shape[1] == 3:
+    return sqrts( s[:,0]*s[:,0]+s[:,1]*s[:,1]-s[:,0]*s[:,1]+3.*s[:,2]*s[:,2] )
+
+  smises = ( s[:,0] - s[:,1] ) * ( s[:,0] - s[:,1] ) + \
+           ( s[:,1] - s[:,2] ) * ( s[:,1] - s[:,2] ) + \
+           ( s[:,2] - s[:,0] ) * ( s[:,2] - s[:,0] )
+
+  smises += 6.0 * ( s[:,3:] * s[:,3:] ).sum( axis=1 )
+  return sqrts( 0.5 * smises )
+
+def hydrostaticStresses( s ):
+
+  return 0.333333333333333*s[:,:3].sum( axis=1 )
+
 class Hardening:
 
+  #----------------------------------------------------------------------------
+  #  The hardening curve is piecewise linear between the tabulated points
+  #  (EqPlasStrains,Stresses). The slopes of the segments are precomputed and
+  #  the segment of an equivalent plastic strain is found by direct indexing
+  #  on the uniform grid of the power law (q), or by a binary search in a
+  #  user table. Beyond the last point the last segment is extrapolated.
+  #----------------------------------------------------------------------------
+
   def __init__ ( self, props ):
 
     self.n = 20
@@ -33,8 +67,8 @@ class Hardening:
 
     if hasattr( props , "EqPlasStrains" ):
       self.htype = 1
-      insert(self.Stresses, 0, self.syield )
-      insert(self.EqPlasStrains, 0, 0. )
+      self.Stresses      = insert( array( self.Stresses , dtype=float ) , 0 , self.syield )
+      self.EqPlasStrains = insert( array( self.EqPlasStrains , dtype=float ) , 0 , 0. )
       
     elif hasattr( props , "q" ):
       self.htype = 2
@@ -54,38 +88,39 @@ class Hardening:
         self.EqPlasStrains[i+1] = (i+1)*epsInc
         self.Stresses[i+1] = self.K * pow(self.EqPlasStrains[i+1]+eps0,self.q)
 
-    print("RR",self.Stresses,self.EqPlasStrains)
+      self.epsInc = epsInc
+
+    else:
+      self.Stresses      = array( [ self.syield , self.syield ] )
+      self.EqPlasStrains = array( [ 0. , self.maxStrain ] )
+
+    self.slopes = diff( self.Stresses ) / diff( self.EqPlasStrains )
+
+    logger.debug( "    Hardening table: %s" % list( zip( self.EqPlasStrains.tolist() , self.Stresses.tolist() ) ) )
  
+  #----------------------------------------------------------------------------
+  #  pre:  equivalent plastic strain, a scalar or an array of many points
+  #  post: yield stress and hardening modulus, of the same shape
+  #----------------------------------------------------------------------------
+
   def getHardening( self , eqplas ):
 
-#    if self.n == 0:
-#      return self.Stresses[0] , self.EqPlasStrains[0]
-#    else:
+    eqplas = asarray( eqplas , dtype=float )
 
-    
-    if True:
+    last = len(self.slopes) - 1
 
-      for i in range(self.n):
-        eqpl1 = self.EqPlasStrains[i+1]
+    if self.htype == 2:
+      i = clip( floor( eqplas / self.epsInc ) , 0 , last ).astype(int)
+    else:
+      i = clip( searchsorted( self.EqPlasStrains , eqplas , side='right' ) - 1 , 0 , last )
 
-        if eqplas < eqpl1:
-          eqpl0  = self.EqPlasStrains[i]
-          deqpl  = eqpl1-eqpl0
-    
-          syiel0 = self.Stresses[i]
-          dsyiel = self.Stresses[i+1]-syiel0
-          
-          hard = dsyiel / deqpl
-          return syiel0 + ( eqplas-eqpl0)*hard  , hard
-     
-      eqpl0  = self.EqPlasStrains[:-1]
-      deqpl  = self.EqPlasStrains[:]-eqpl0
-    
-      syiel0 = self.Stresses[:-1]
-      dsyiel = self.Stresses[:]-syiel0
-     
-      hard = dsyiel / deqpl
-      return siyel0 + ( eqplas-eqpl0)*hard  , hard
+    hard   = self.slopes[i]
+    syield = self.Stresses[i] + ( eqplas - self.EqPlasStrains[i] ) * hard
+
+    if eqplas.ndim == 0:
+      return float(syield) , float(hard)
+
+    return syield , hard
       
 #
 #
@@ -94,6 +129,21 @@ class Hardening:
 def transform2To3( s ):
   return array([ s[0] , s[1] , 0. , 0. , 0. , s[2] ])
 
+#------------------------------------------------------------------------------
+#  transforms2To3, transforms3To2: the same for stacked strains, stresses and
+#  tangents
+#------------------------------------------------------------------------------
+
+PLANE_COMPONENTS = [ 0 , 1 , 5 ]
+
+def transforms2To3( s ):
+  t = zeros( shape=(len(s),6) )
+  t[:,PLANE_COMPONENTS] = s
+  return t
+
+def transforms3To2( s , t ):
+  return s[:,PLANE_COMPONENTS] , t[:,PLANE_COMPONENTS][:,:,PLANE_COMPONENTS]
+
 def transform3To2( s , t ):
   return array([ s[0] , s[1] , s[5] ]) , \
          array([(t[0,0] , t[0,1] , t[0,5]), \
@@ -1,6 +1,6 @@
-import copy
+from numpy import array, newaxis
 
-from numpy import zeros
+from pyfem.materials.NumericalTangent import NumericalTangent
 
 
 class MaterialManager(list):
@@ -23,6 +23,7 @@ class MaterialManager(list):
             failure = getattr(__import__('pyfem.materials.' + failureType, \
                                          globals(), locals(), failureType, 0), failureType)
 
+            # The failure indices are evaluated once per converged step by the element group
             self.failure = failure(matProps)
             self.failureFlag = True
 
@@ -50,36 +51,23 @@ class MaterialManager(list):
 
         if self.mat.numericalTangent:
             self.mat.storeOutputFlag = True
-            sigma1, tang = self.mat.getStress(kinematic)
 
-            self.mat.realNewHistory = copy.deepcopy(self.mat.newHistory)
+            # The point and its perturbations are evaluated as one batch, which leaves the history of the
+            # material object unchanged
+            history = {name: array(value, dtype=float)[newaxis] for name, value in self.mat.oldHistory.items()}
 
-            nStr = len(kinematic.strain)
+            sigma, tang, newHistory, outData = NumericalTangent(self.mat).getStresses(
+                array(kinematic.strain)[newaxis], array(kinematic.dstrain)[newaxis], history)
 
-            tan0 = zeros(shape=(nStr, nStr))
+            self.mat.newHistory = {name: values[0] for name, values in newHistory.items()}
+            self.mat.outData = outData[0]
 
-            self.mat.storeOutputFlag = False
-
-            for i in range(nStr):
-                kin0 = copy.deepcopy(kinematic)
-                kin0.strain[i] += 1.0e-9
-                kin0.dstrain[i] += 1.0e-9
-
-                sigma, tang = self.mat.getStress(kin0)
-
-                tan0[i, :] = (sigma - sigma1) / (kin0.strain[i] - kinematic.strain[i])
-
-            result = (sigma1, tan0)
-
-            self.mat.newHistory = copy.deepcopy(self.mat.realNewHistory)
+            result = (sigma[0], tang[0])
 
         else:
             self.mat.storeOutputFlag = True
             result = self.mat.getStress(kinematic)
 
-        if self.failureFlag:
-            self.failure.check(result[0], kinematic)
-
         return result
 
     def getStressPiezo(self, kinematic, elecField, iSam=-1):
@@ -94,12 +82,7 @@ class MaterialManager(list):
 
         self.mat = self.matlist[self.iSam]
 
-        result = self.mat.getStressPiezo(kinematic, elecField)
-
-        if self.failureFlag:
-            self.failure.check(result[0], kinematic, elecField)
-
-        return result
+        return self.mat.getStressPiezo(kinematic, elecField)
 
     def outLabels(self):
         return self.mat.outLabels
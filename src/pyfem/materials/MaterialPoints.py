@@ -0,0 +1,247 @@
+import numpy as np
+
+from pyfem.materials.HistoryStore import HistoryStore
+from pyfem.materials.MaterialPool import MaterialPool
+from pyfem.materials.NumericalTangent import NumericalTangent
+
+
+class MaterialPoints:
+    """
+    The integration points of all elements of a group, which share one material object. The history of the points
+    is stored as arrays with the element position in the group and the integration point as the first two axes,
+    and all points of a range of elements are evaluated at once by the getStresses function of the material.
+
+    Like the history of the single point materials, the trial history of an evaluation always starts from the
+    committed history, and commit_history accepts the trial history of the last evaluation. Both are kept in the
+    two buffers of a HistoryStore, so that committing is a swap of the buffers. Materials with numericalTangent set
+    are evaluated through a NumericalTangent.
+
+    For materials with a constant tangent, element kernels can skip the evaluation of the points. They store the
+    element states with setStates instead, and the stresses are only computed for the output.
+
+    For materials with an elastic tangent, the evaluation marks the elements which have a point with another
+    tangent, e.g. a yielding point, as active. Element kernels only compute the stiffness matrices of the active
+    elements from the tangents and reuse the elastic stiffness matrices of the others. Materials which support the
+    elastic trial are not evaluated for the elements which were not active in the previous evaluation: their
+    points are updated by the elastic trial of getElasticStresses, and only the elements with a point whose trial
+    state is not admissible are evaluated with the active elements.
+
+    Materials with the property processes larger than one are evaluated in parallel by a MaterialPool, which keeps
+    the history and the output data of the points in shared memory.
+
+    Materials with the property traceFile write the records of the points chosen in the .pro file to a
+    MaterialTrace, which is set by set_trace and selects the traced points before every evaluation.
+    """
+
+    def __init__(self, material, number_of_elements, points_per_element, empty=np.empty):
+        """
+        :param material: the material object, which implements getStresses and getInitialHistory
+        :param number_of_elements: the number of elements of the group
+        :param points_per_element: the number of integration points of each element
+        :param empty: the function which allocates the arrays, e.g. the one of a scratch space
+        """
+        self.material = material
+        self.evaluate = NumericalTangent(material).getStresses if material.numericalTangent else material.getStresses
+        self.outLabels = material.outLabels
+        self.shape = (number_of_elements, points_per_element)
+        self.outData = None
+
+        self.tangent = None if material.numericalTangent else material.getConstantTangent()
+        self.elasticTangent = None if material.numericalTangent else material.getElasticTangent()
+        self.states = None
+        self.active = None
+        self.elasticTrial = self.elasticTangent is not None and material.supportsElasticTrial
+        self.trace = None
+
+        self._empty = empty
+
+        processes = getattr(material, 'processes', 1)
+        self.pool = MaterialPool(processes) if processes > 1 else None
+
+        if self.pool is None:
+            self.history = HistoryStore(material.getInitialHistory(), self.shape, empty)
+        else:
+            self.history = HistoryStore(material.getInitialHistory(), self.shape, self.pool.empty)
+            self.outData = self.pool.empty(self.shape + (len(self.outLabels),))
+            self.pool.start(self.evaluate)
+
+    def getStresses(self, elements, strain, dstrain):
+        """
+        Compute the stresses and the tangents of all integration points of a range of elements and store their
+        trial history and output data.
+
+        :param elements: the slice of element positions in the group
+        :param strain: the (number_of_elements, points_per_element, number_of_strains) array of strains
+        :param dstrain: the array of strain increments of the step, of the same shape
+        :return: the stacked stresses and tangents, with the element and the point as the first two axes. If all
+            elements are updated by the elastic trial, the tangents are a read-only view of the elastic tangent
+        """
+        elastic = None
+
+        if self.elasticTrial and self.active is not None:
+            elastic, elastic_sigma = self._update_elastic(elements, strain, dstrain)
+
+        if elastic is None or not elastic.any():
+            sigma, tang = self._evaluate(elements, strain, dstrain)
+            self.update_active(elements, tang)
+            return sigma, tang
+
+        if elastic.all():
+            self.active[elements] = False
+            return elastic_sigma, np.broadcast_to(self.elasticTangent, strain.shape[:2] + self.elasticTangent.shape)
+
+        positions = np.arange(self.shape[0])[elements]
+        evaluated = ~elastic
+
+        sigma = np.empty(strain.shape[:2] + elastic_sigma.shape[2:])
+        tang = np.empty(strain.shape[:2] + self.elasticTangent.shape)
+
+        sigma[elastic] = elastic_sigma
+        tang[elastic] = self.elasticTangent
+        self.active[positions[elastic]] = False
+
+        sigma[evaluated], tang[evaluated] = self._evaluate(positions[evaluated], strain[evaluated],
+                                                           dstrain[evaluated])
+        self.update_active(positions[evaluated], tang[evaluated])
+
+        return sigma, tang
+
+    def _update_elastic(self, elements, strain, dstrain):
+        # The elements of the range which were not active in the previous evaluation are updated by the elastic
+        # trial if it is admissible for all their points. Returns the mask of these elements in the range and
+        # their stresses. If all elements of the range are updated, they are indexed by the range itself, which
+        # avoids copies of the history
+        candidates = ~self.active[elements]
+
+        if not candidates.any():
+            return None, None
+
+        if candidates.all():
+            index = elements
+        else:
+            index = np.arange(self.shape[0])[elements][candidates]
+            strain, dstrain = strain[candidates], dstrain[candidates]
+
+        shape = strain.shape[:2]
+
+        history = {name: values[index].reshape((-1,) + values.shape[2:])
+                   for name, values in self.history.committed.items()}
+
+        sigma, newHistory, outData, admissible = self.material.getElasticStresses(
+            strain.reshape(-1, strain.shape[2]), dstrain.reshape(-1, dstrain.shape[2]), history)
+
+        admissible = admissible.reshape(shape).all(axis=1)
+
+        if admissible.all():
+            updated = slice(None)
+        else:
+            updated = admissible
+            index = np.arange(self.shape[0])[elements][candidates][admissible]
+
+        for name, values in newHistory.items():
+            self.history.set(name, index, values.reshape(shape + values.shape[1:])[updated])
+
+        self._set_output(index, outData.reshape(shape + outData.shape[1:])[updated])
+
+        elastic = np.zeros(len(candidates), dtype=bool)
+        elastic[np.flatnonzero(candidates)[admissible]] = True
+
+        return elastic, sigma.reshape(shape + sigma.shape[1:])[updated]
+
+    def _evaluate(self, elements, strain, dstrain):
+        # Evaluate the material for the points of the elements, a slice or an array of element positions
+        if self.trace is not None:
+            self.trace.select(elements, strain.shape[2] + 1 if self.material.numericalTangent else 1)
+
+        if self.pool is not None:
+            return self.pool.getStresses(self.history, self.outData, elements, strain, dstrain)
+
+        shape = strain.shape[:2]
+        history = {name: values[elements].reshape((-1,) + values.shape[2:])
+                   for name, values in self.history.committed.items()}
+
+        sigma, tang, newHistory, outData = self.evaluate(strain.reshape(-1, strain.shape[2]),
+                                                         dstrain.reshape(-1, dstrain.shape[2]), history)
+
+        for name, values in newHistory.items():
+            self.history.set(name, elements, values.reshape(shape + values.shape[1:]))
+
+        self._set_output(elements, outData.reshape(shape + outData.shape[1:]))
+
+        return sigma.reshape(shape + sigma.shape[1:]), tang.reshape(shape + tang.shape[1:])
+
+    def _set_output(self, elements, outData):
+        if self.outData is None:
+            self.outData = self._empty(self.shape + outData.shape[2:], dtype=float)
+
+        self.outData[elements] = outData
+
+    def update_active(self, elements, tang):
+        """
+        Mark the elements with a point whose tangent is not the elastic tangent as active.
+
+        :param elements: the slice or the array of element positions in the group
+        :param tang: the stacked tangents of the points of the elements
+        """
+        if self.elasticTangent is None:
+            return
+
+        if self.active is None:
+            self.active = np.zeros(self.shape[0], dtype=bool)
+
+        self.active[elements] = (tang != self.elasticTangent).any(axis=(2, 3)).any(axis=1)
+
+    def setStates(self, elements, states):
+        """
+        Store the states of a range of elements, which the stresses of a material with a constant tangent are
+        computed from.
+
+        :param elements: the slice of element positions in the group
+        :param states: the (number_of_elements, number_of_dofs) array of element states
+        """
+        if self.states is None:
+            self.states = self._empty((self.shape[0], states.shape[1]), dtype=float)
+
+        self.states[elements] = states
+
+    def set_trace(self, trace):
+        """
+        Trace the evaluations of the points.
+
+        :param trace: the MaterialTrace, which is also set as the trace of the material
+        """
+        if self.pool is not None:
+            raise RuntimeError(f"The material {type(self.material).__name__} can not be traced when it is "
+                               f"evaluated by more than one process")
+
+        self.trace = trace
+        self.material.trace = trace
+
+    def commit_history(self):
+        """
+        Accept the trial history of the last evaluation of the points.
+        """
+        self.history.commit()
+
+        if self.trace is not None:
+            self.trace.flush()
+
+    def rollback_history(self):
+        """
+        Discard the trial history of the points.
+        """
+        self.history.rollback()
+
+    def close(self):
+        """
+        Stop the workers of the material pool and close the trace. The history and the output data remain
+        available, and later evaluations are done in this process.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+            self.material.trace = None
@@ -0,0 +1,249 @@
+import multiprocessing
+import time
+from multiprocessing.sharedctypes import RawArray
+
+import numpy as np
+
+from pyfem.utils.logger import get_logger
+
+logger = get_logger()
+
+
+def _shared_view(raw, shape):
+    return np.frombuffer(raw, dtype=float, count=int(np.prod(shape))).reshape(shape)
+
+
+def _work(connection, evaluate, raws, shapes):
+    # The worker process evaluates the points of the element ranges it receives. It reads the committed history and
+    # writes the trial history and the output data of its points in place in the shared arrays
+    arrays = [_shared_view(raw, shape) for raw, shape in zip(raws, shapes)]
+
+    while True:
+        task = connection.recv()
+
+        if task is None:
+            break
+
+        start = time.perf_counter()
+
+        elements, committed, trial, output, strain, dstrain = task
+        shape = strain.shape[:2]
+
+        history = {name: arrays[index][elements].reshape((-1,) + arrays[index].shape[2:])
+                   for name, index in committed.items()}
+
+        # Errors of the material, e.g. a return mapping which does not converge, are raised by the parent
+        try:
+            sigma, tang, newHistory, outData = evaluate(strain.reshape(-1, strain.shape[2]),
+                                                        dstrain.reshape(-1, dstrain.shape[2]), history)
+        except Exception as error:
+            connection.send(error)
+            continue
+
+        for name, values in newHistory.items():
+            arrays[trial[name]][elements] = values.reshape(shape + values.shape[1:])
+
+        arrays[output][elements] = outData.reshape(shape + outData.shape[1:])
+
+        connection.send((sigma, tang, list(newHistory), time.perf_counter() - start))
+
+    connection.close()
+
+
+class MaterialPool:
+    """
+    A pool of worker processes which evaluate the material points of an element group in parallel, for expensive
+    constitutive models. It is enabled per material in the .pro file, e.g.
+
+      material =
+      {
+        type      = "IsotropicHardeningPlasticity";
+        ...
+        processes = 4;
+      };
+
+    The history and the output data of the points are allocated in shared memory by the pool before the workers
+    are started, which inherit them. Every evaluation splits the evaluated elements into one contiguous part per
+    worker, and only the strains of the part are sent to its worker and only its stresses and tangents are sent
+    back. The busy time of every worker is accumulated and reported by log_load_balance.
+
+    The workers are started by the default start method of the platform. Under spawn, the default on Windows and
+    macOS, they import the main module of the analysis, so its analysis must be guarded by
+    if __name__ == '__main__', as in app.py. Errors of the material in a worker are raised by getStresses, and a
+    worker which has exited raises a RuntimeError instead of a broken connection.
+    """
+
+    def __init__(self, processes):
+        """
+        :param processes: the number of worker processes
+        """
+        self.processes = processes
+
+        self._raws = []
+        self._shapes = []
+        self._index = {}
+        self._connections = []
+        self._workers = []
+
+        self.busy = np.zeros(processes)
+        self.points = np.zeros(processes, dtype=int)
+
+    def empty(self, shape, dtype=float):
+        """
+        Allocate an array in shared memory. All shared arrays must be allocated before the workers are started.
+
+        :param shape: the shape of the array
+        :param dtype: the type of the array, which must be float
+        :return: the array
+        """
+        if np.dtype(dtype) != np.float64:
+            raise ValueError("The shared arrays of a material pool must be float arrays")
+        if self._workers:
+            raise RuntimeError("The shared arrays of a material pool must be allocated before the workers start")
+
+        shape = tuple(shape)
+        raw = RawArray('d', max(int(np.prod(shape)), 1))
+        array = _shared_view(raw, shape)
+
+        self._index[id(array)] = len(self._raws)
+        self._raws.append(raw)
+        self._shapes.append(shape)
+
+        return array
+
+    def start(self, evaluate):
+        """
+        Start the worker processes.
+
+        :param evaluate: the function which evaluates the points, like the getStresses function of a material
+        """
+        context = multiprocessing.get_context()
+
+        for _ in range(self.processes):
+            connection, child = context.Pipe()
+
+            worker = context.Process(target=_work, args=(child, evaluate, self._raws, self._shapes), daemon=True)
+            worker.start()
+            child.close()
+
+            self._connections.append(connection)
+            self._workers.append(worker)
+
+    def getStresses(self, history, outData, elements, strain, dstrain):
+        """
+        Evaluate the material points of a set of elements in the workers.
+
+        :param history: the HistoryStore of the points, whose buffers are shared arrays of the pool
+        :param outData: the shared array of output data of the points
+        :param elements: the slice or the array of element positions in the group
+        :param strain: the (number_of_elements, points_per_element, number_of_strains) array of strains
+        :param dstrain: the array of strain increments of the step, of the same shape
+        :return: the stacked stresses and tangents, with the element and the point as the first two axes
+        """
+        committed, trial = history.buffers
+        committed = {name: self._index[id(values)] for name, values in committed.items()}
+        trial = {name: self._index[id(values)] for name, values in trial.items()}
+        output = self._index[id(outData)]
+
+        parts = [part for part in np.array_split(np.arange(len(strain)), self.processes) if len(part)]
+
+        for worker, part in enumerate(parts):
+            start, stop = part[0], part[-1] + 1
+
+            if isinstance(elements, slice):
+                index = slice(elements.start + start, elements.start + stop)
+            else:
+                index = elements[start:stop]
+
+            self._send(worker, (index, committed, trial, output, strain[start:stop], dstrain[start:stop]))
+
+        results = [self._receive(worker) for worker in range(len(parts))]
+
+        # The results of all workers are received before an error is raised, to keep the pipes in step
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+        sigma = []
+        tang = []
+
+        for worker, result in enumerate(results):
+            part_sigma, part_tang, names, busy = result
+
+            sigma.append(part_sigma)
+            tang.append(part_tang)
+
+            for name in names:
+                history.set_in_place(name)
+
+            self.busy[worker] += busy
+            self.points[worker] += len(part_sigma)
+
+        shape = strain.shape[:2]
+        sigma = np.concatenate(sigma)
+        tang = np.concatenate(tang)
+
+        return sigma.reshape(shape + sigma.shape[1:]), tang.reshape(shape + tang.shape[1:])
+
+    def _send(self, worker, task):
+        self._check_alive(worker)
+
+        try:
+            self._connections[worker].send(task)
+        except (BrokenPipeError, ConnectionResetError) as error:
+            self._check_alive(worker)
+            raise RuntimeError(f"The worker {worker} of the material pool does not accept tasks") from error
+
+    def _receive(self, worker):
+        try:
+            return self._connections[worker].recv()
+        except (EOFError, ConnectionResetError) as error:
+            self._workers[worker].join(timeout=1.0)
+            self._check_alive(worker)
+            raise RuntimeError(f"The worker {worker} of the material pool closed its connection") from error
+
+    def _check_alive(self, worker):
+        if self._workers[worker].is_alive():
+            return
+
+        message = f"The worker {worker} of the material pool has exited with code {self._workers[worker].exitcode}"
+
+        if multiprocessing.get_start_method() != 'fork':
+            message += (". The workers import the main module, whose analysis must be guarded by "
+                        "if __name__ == '__main__'")
+
+        raise RuntimeError(message)
+
+    def log_load_balance(self, name):
+        """
+        Log the busy time and the number of evaluated points of every worker since the last report.
+
+        :param name: the name which identifies the pool in the log, e.g. the name of the element group
+        """
+        if not self.busy.any():
+            return
+
+        logger.info('    Material pool %s : %i workers, load imbalance %5.3f' %
+                    (name, self.processes, self.busy.max() / self.busy.mean()))
+
+        for worker in range(self.processes):
+            logger.info('      worker %2i : %8.4f s  %10i points' % (worker, self.busy[worker], self.points[worker]))
+
+        self.busy[:] = 0.0
+        self.points[:] = 0
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        for connection, worker in zip(self._connections, self._workers):
+            if worker.is_alive():
+                try:
+                    connection.send(None)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+            connection.close()
+            worker.join()
+
+        self._connections = []
+        self._workers = []
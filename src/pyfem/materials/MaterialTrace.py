@@ -0,0 +1,141 @@
+import struct
+
+import numpy as np
+
+# The header of a record: the event name, the number of the evaluation, the number of points and of values per point
+_HEADER = struct.Struct('<16sQII')
+
+
+def _record_type(width):
+    return np.dtype([('element', '<i8'), ('point', '<i4'), ('values', '<f8', (width,))])
+
+
+def read_trace(file_name):
+    """
+    Read a trace file.
+
+    :param file_name: the name of the trace file
+    :return: an iterator over the records, as tuples of the event name, the number of the evaluation and a
+        structured array with the element id, the point and the values of every traced point
+    """
+    with open(file_name, 'rb') as f:
+        while True:
+            header = f.read(_HEADER.size)
+
+            if len(header) < _HEADER.size:
+                break
+
+            event, evaluation, count, width = _HEADER.unpack(header)
+            record_type = _record_type(width)
+
+            yield event.rstrip(b'\0').decode(), evaluation, np.frombuffer(f.read(count * record_type.itemsize),
+                                                                          dtype=record_type)
+
+
+class MaterialTrace:
+    """
+    A trace of the evaluations of chosen material points, for debugging constitutive models. It is enabled per
+    material in the .pro file, e.g.
+
+      material =
+      {
+        type          = "IsotropicHardeningPlasticity";
+        ...
+        traceFile     = "plasticity.trace";
+        traceElements = [ 12 , 13 ];    (the element ids, all elements of the group by default)
+        tracePoints   = [ 0 ];          (the integration points of these elements, all points by default)
+      };
+
+    Before every evaluation, select marks the rows of the batch of points which are traced. The material then
+    writes its records for these rows only, e.g. the iterations of its return mapping. Materials keep their trace
+    in the attribute trace, which is None if tracing is disabled, so that the cost of a disabled trace is one test
+    per evaluation. The points of the elements which are updated by the elastic trial of the material are not
+    evaluated and have no records.
+
+    The records are written to a buffered binary file, which is flushed when the history is committed, and read
+    back by read_trace.
+    """
+
+    def __init__(self, file_name, element_ids, points_per_element, elements=None, points=None):
+        """
+        :param file_name: the name of the trace file
+        :param element_ids: the ids of the elements of the group
+        :param points_per_element: the number of integration points of each element
+        :param elements: the ids of the traced elements, or None for all elements
+        :param points: the traced integration points of these elements, or None for all points
+        """
+        self.element_ids = np.asarray(element_ids, dtype=int)
+        self.mask = np.zeros((len(self.element_ids), points_per_element), dtype=bool)
+
+        rows = slice(None) if elements is None else np.isin(self.element_ids, elements)
+        columns = slice(None) if points is None else np.asarray(points, dtype=int)
+
+        self.mask[np.ix_(np.arange(len(self.element_ids))[rows], np.arange(points_per_element)[columns])] = True
+
+        self.evaluation = 0
+
+        self._file = open(file_name, 'wb', buffering=1 << 20)
+        self._position = None
+        self._elements = None
+        self._points = None
+
+    def select(self, elements, repeats=1):
+        """
+        Select the traced points of the next evaluation.
+
+        :param elements: the slice or the array of element positions in the group which are evaluated
+        :param repeats: the number of consecutive rows of every point in the batch, of which the first is traced,
+            e.g. the perturbations of a numerical tangent
+        """
+        self.evaluation += 1
+
+        mask = self.mask[elements]
+        element_index, points = np.nonzero(mask)
+
+        if len(points) == 0:
+            self._position = None
+            return
+
+        self._position = np.full(mask.size * repeats, -1)
+        self._position[(element_index * mask.shape[1] + points) * repeats] = np.arange(len(points))
+        self._elements = self.element_ids[elements][element_index]
+        self._points = points
+
+    def write(self, event, columns, rows=None):
+        """
+        Write a record for the traced points of the current evaluation.
+
+        :param event: the name of the event, at most 16 characters
+        :param columns: the sequence of values to trace, one array with a value per row of the batch or of rows
+        :param rows: the rows of the batch which the values belong to, or None for all rows
+        """
+        if self._position is None:
+            return
+
+        position = self._position if rows is None else self._position[rows]
+        traced = position >= 0
+
+        if not traced.any():
+            return
+
+        record = np.empty(np.count_nonzero(traced), dtype=_record_type(len(columns)))
+        record['element'] = self._elements[position[traced]]
+        record['point'] = self._points[position[traced]]
+
+        for column, values in enumerate(columns):
+            record['values'][:, column] = np.broadcast_to(values, traced.shape)[traced]
+
+        self._file.write(_HEADER.pack(event.encode(), self.evaluation, len(record), len(columns)))
+        self._file.write(record.tobytes())
+
+    def flush(self):
+        """
+        Write the buffered records to the file.
+        """
+        self._file.flush()
+
+    def close(self):
+        """
+        Close the file.
+        """
+        self._file.close()
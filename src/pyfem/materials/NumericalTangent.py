@@ -0,0 +1,69 @@
+from numpy import eye, imag, real, repeat, newaxis, swapaxes, zeros
+
+
+class NumericalTangent:
+    """
+    The numerical tangent of a material, computed from one batched evaluation of the getStresses function of the
+    material. For every point the batch holds the unperturbed strain and one perturbed strain per strain
+    component, so that the history of the points only has to be repeated and never copied or restored.
+
+    The .pro file selects the method with the material properties
+
+      numericalTangent = true;
+      perturbation     = 1.e-9;   (the size of the perturbation, 1.e-9 by default)
+      complexStep      = true;    (complex-step differentiation instead of forward differences)
+
+    Complex-step differentiation perturbs the imaginary part of the strains, which gives tangents that are exact
+    up to round-off for any perturbation size, but it requires a material whose stresses are computed by complex
+    analytic operations only. Such materials set supportsComplexStep.
+    """
+
+    def __init__(self, material):
+        """
+        :param material: the material object
+        """
+        self.material = material
+        self.perturbation = material.perturbation
+        self.complexStep = material.complexStep
+
+        if self.complexStep and not material.supportsComplexStep:
+            raise RuntimeError(f"The material {type(material).__name__} does not support the complex-step "
+                               f"numerical tangent")
+
+    def getStresses(self, strain, dstrain, history):
+        """
+        Compute the stresses of many material points and their numerical tangents.
+
+        :param strain: the (number_of_points, number_of_strains) array of strains
+        :param dstrain: the (number_of_points, number_of_strains) array of strain increments of the step
+        :param history: a dict with the committed history of the points, one row per point
+        :return: the stresses, the tangents, a dict with the new history and the output data, all stacked by point
+        """
+        n, nstr = strain.shape
+
+        # Row 0 of the perturbations of a point is the unperturbed state, row 1 + i perturbs strain component i
+        if self.complexStep:
+            step = zeros(shape=(nstr + 1, nstr), dtype=complex)
+            step[1:] = 1j * self.perturbation * eye(nstr)
+        else:
+            step = zeros(shape=(nstr + 1, nstr))
+            step[1:] = self.perturbation * eye(nstr)
+
+        sigma, _, newHistory, outData = self.material.getStresses(
+            (strain[:, newaxis] + step).reshape(-1, nstr),
+            (dstrain[:, newaxis] + step).reshape(-1, nstr),
+            {name: repeat(values, nstr + 1, axis=0) for name, values in history.items()})
+
+        sigma = sigma.reshape(n, nstr + 1, nstr)
+
+        if self.complexStep:
+            dsigma = imag(sigma[:, 1:]) / self.perturbation
+        else:
+            dsigma = (sigma[:, 1:] - sigma[:, :1]) / self.perturbation
+
+        # dsigma[p, i, j] is the derivative of stress component j to strain component i
+        tang = swapaxes(dsigma, 1, 2)
+
+        newHistory = {name: real(values[::nstr + 1]) for name, values in newHistory.items()}
+
+        return real(sigma[:, 0]), tang, newHistory, real(outData[::nstr + 1])
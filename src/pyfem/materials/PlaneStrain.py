@@ -1,9 +1,10 @@
-from numpy import zeros, dot
+from numpy import zeros, dot, broadcast_to
 
 from pyfem.materials.BaseMaterial import BaseMaterial
 
 
 class PlaneStrain(BaseMaterial):
+    supportsComplexStep = True
 
     def __init__(self, props):
         # Call the BaseMaterial constructor
@@ -28,5 +29,13 @@ class PlaneStrain(BaseMaterial):
 
         return sigma, self.H
 
+    def getStresses(self, strain, dstrain, history):
+        sigma = strain @ self.H.T
+
+        return sigma, broadcast_to(self.H, (len(strain),) + self.H.shape), {}, sigma
+
     def getTangent(self):
         return self.H
+
+    def getConstantTangent(self):
+        return self.H
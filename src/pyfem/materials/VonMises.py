@@ -1,7 +1,5 @@
-
-
 from pyfem.materials.BaseFailure import BaseFailure
-from pyfem.materials.MatUtils    import vonMisesStress
+from pyfem.materials.MatUtils    import vonMisesStresses
 
 class VonMises( BaseFailure ):
 
@@ -11,9 +9,11 @@ class VonMises( BaseFailure ):
     
     self.smax = props.smax
 
-  def check( self, stress , deformation ):
+  #----------------------------------------------------------------------------
+  #  pre:  stresses of many points, one row per point
+  #  post: the ratios of their von Mises stresses to smax
+  #----------------------------------------------------------------------------
 
-    FI = vonMisesStress( stress ) / self.smax
-    
-    print(FI)
-    return FI
+  def getFailureIndices( self , stresses ):
+
+    return vonMisesStresses( stresses ) / self.smax
@@ -0,0 +1,176 @@
+from itertools import permutations
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from pyfem.fem.ElementSet import ElementSet
+from pyfem.fem.NodeSet import NodeSet
+from pyfem.utils.logger import get_logger
+
+logger = get_logger()
+
+ELEMENT_TYPES = {'quad4': 2, 'quad8': 2, 'tria3': 2, 'hex8': 3, 'tetra4': 3}
+
+BOUNDARY_NAMES = [('left', 'right'), ('bottom', 'top'), ('back', 'front')]
+
+
+def structured_mesh(element_type: str, divisions: Union[List[int], Tuple[int, ...]],
+                    size: Union[List[float], Tuple[float, ...]] = None,
+                    origin: Union[List[float], Tuple[float, ...]] = None) -> Tuple[np.ndarray, np.ndarray,
+                                                                                     Dict[str, np.ndarray]]:
+    """
+    Create a structured mesh of a rectangle or a box. The nodes are numbered with x running fastest, then y and z.
+
+    The node order of the elements follows the shape functions of pyfem.utils.shape_functions: counterclockwise
+    for quad4 and tria3, corner and midside nodes alternating for quad8, the bottom face and then the top face for
+    hex8. Each hex of a tetra4 mesh is split into six tetrahedra around its main diagonal, which gives a
+    conforming mesh.
+
+    :param element_type: one of 'quad4', 'quad8', 'tria3', 'hex8' and 'tetra4'
+    :param divisions: the number of elements (of hexahedra for tetra4) along each axis
+    :param size: the size of the domain along each axis, 1.0 by default
+    :param origin: the lowest corner of the domain, 0.0 by default
+    :raises ValueError: if the element type is unknown or if the divisions do not match its dimension
+    :return: the (number_of_nodes, rank) coordinates, the (number_of_elements, number_of_element_nodes)
+        connectivity in node indices, and the node indices of the boundary groups left, right, bottom, top, and
+        back and front in 3D
+    """
+    if element_type not in ELEMENT_TYPES:
+        raise ValueError(f"Unknown element type {element_type}, the type should be one of {list(ELEMENT_TYPES)}")
+
+    rank = ELEMENT_TYPES[element_type]
+    divisions = np.asarray(divisions, dtype=int).reshape(-1)
+
+    if len(divisions) != rank or np.any(divisions < 1):
+        raise ValueError(f"The {element_type} mesh needs {rank} positive numbers of divisions")
+
+    size = np.ones(rank) if size is None else np.asarray(size, dtype=float).reshape(rank)
+    origin = np.zeros(rank) if origin is None else np.asarray(origin, dtype=float).reshape(rank)
+
+    # Quadratic elements use a grid with twice the number of intervals, whose odd-odd points are left out
+    refinement = 2 if element_type == 'quad8' else 1
+    shape = divisions * refinement + 1
+
+    grid = np.indices(shape[::-1]).reshape(rank, -1)[::-1].T  # The grid indices, x running fastest
+    coords = origin + grid * (size / (shape - 1))
+
+    if element_type == 'quad8':
+        keep = np.any(grid % 2 == 0, axis=1)
+        coords = coords[keep]
+        grid = grid[keep]
+        numbers = np.full(len(keep), -1)
+        numbers[keep] = np.arange(np.count_nonzero(keep))
+    else:
+        numbers = np.arange(len(grid))
+
+    numbers = numbers.reshape(shape[::-1]).T  # numbers[i, j(, k)] is the node index at the grid point
+
+    cells = np.indices(divisions).reshape(rank, -1).T * refinement  # The lowest grid point of each cell
+
+    if element_type == 'quad8':
+        offsets = [(0, 0), (1, 0), (2, 0), (2, 1), (2, 2), (1, 2), (0, 2), (0, 1)]
+    elif rank == 2:
+        offsets = [(0, 0), (1, 0), (1, 1), (0, 1)]
+    else:
+        offsets = [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0), (0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)]
+
+    connectivity = np.stack([numbers[tuple((cells + offset).T)] for offset in offsets], axis=1)
+
+    # Order the cells like the nodes, x running fastest
+    connectivity = connectivity[np.lexsort(cells.T)]
+
+    if element_type == 'tria3':
+        connectivity = connectivity[:, [0, 1, 2, 0, 2, 3]].reshape(-1, 3)
+    elif element_type == 'tetra4':
+        connectivity = _split_hexahedra(connectivity, coords)
+
+    groups = {}
+    for axis in range(rank):
+        low, high = BOUNDARY_NAMES[axis]
+        groups[low] = np.flatnonzero(grid[:, axis] == 0)
+        groups[high] = np.flatnonzero(grid[:, axis] == shape[axis] - 1)
+
+    return coords, connectivity, groups
+
+
+def _split_hexahedra(connectivity: np.ndarray, coords: np.ndarray) -> np.ndarray:
+    # The corner k of a hex8 is at the bits (x, y, z) of CORNER_BITS[k]
+    corner_bits = [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0), (0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)]
+    corners = {bits: k for k, bits in enumerate(corner_bits)}
+
+    # Each tetrahedron walks from corner (0, 0, 0) to corner (1, 1, 1) along the axes in the order of a permutation
+    local = []
+    for axes in permutations(range(3)):
+        bits = [0, 0, 0]
+        path = [corners[tuple(bits)]]
+        for axis in axes:
+            bits[axis] = 1
+            path.append(corners[tuple(bits)])
+        local.append(path)
+
+    tetrahedra = connectivity[:, local].reshape(-1, 4)
+
+    # Swap two nodes of the tetrahedra with a negative volume
+    x = coords[tetrahedra]
+    volume = np.linalg.det(x[:, 1:] - x[:, :1])
+    tetrahedra[volume < 0, 1:3] = tetrahedra[volume < 0, 2:0:-1]
+
+    return tetrahedra
+
+
+def add_structured_mesh(nodes: NodeSet, elements: ElementSet, group_name: str, element_type: str,
+                        divisions: Union[List[int], Tuple[int, ...]],
+                        size: Union[List[float], Tuple[float, ...]] = None,
+                        origin: Union[List[float], Tuple[float, ...]] = None) -> None:
+    """
+    Create a structured mesh and add it to empty NodeSet and ElementSet objects. The node ids and the element ids
+    start from 0. The boundary node groups are added to the NodeSet, together with a node group of all nodes named
+    after the element group, as for a gmsh file.
+
+    :param nodes: the empty NodeSet
+    :param elements: the empty ElementSet of the nodes
+    :param group_name: the name of the element group, which must be defined in the .pro file
+    :param element_type: one of 'quad4', 'quad8', 'tria3', 'hex8' and 'tetra4'
+    :param divisions: the number of elements (of hexahedra for tetra4) along each axis
+    :param size: the size of the domain along each axis, 1.0 by default
+    :param origin: the lowest corner of the domain, 0.0 by default
+    :raises RuntimeError: if the element group is not defined in the .pro file
+    """
+    if not hasattr(elements.props, group_name):
+        raise RuntimeError(f"The element group {group_name} of the generated mesh is not defined")
+
+    coords, connectivity, groups = structured_mesh(element_type, divisions, size, origin)
+
+    nodes.rank = coords.shape[1]
+    nodes.add_items_by_ids(np.arange(len(coords)), coords)
+    for name, node_indices in groups.items():
+        nodes.add_to_group_by_ids(name, node_indices)
+    nodes.add_to_group_by_ids(group_name, np.arange(len(coords)))
+
+    elements.add_items_by_element_ids(group_name, np.arange(len(connectivity)), connectivity)
+
+
+def read_mesh_props(nodes: NodeSet, elements: ElementSet, mesh_props) -> None:
+    """
+    Generate the mesh given by the mesh block of the .pro file, which replaces the nodes and the elements of the
+    input file:
+
+        mesh =
+        {
+          type      = "quad4";
+          group     = "rectangle";
+          divisions = [100, 100];
+          size      = [10.0, 10.0];
+          origin    = [0.0, 0.0];
+        };
+
+    The size and the origin are optional.
+
+    :param nodes: the empty NodeSet
+    :param elements: the empty ElementSet of the nodes
+    :param mesh_props: the mesh block of the .pro file
+    """
+    logger.info("Generating mesh ..............")
+
+    add_structured_mesh(nodes, elements, mesh_props.group, mesh_props.type, mesh_props.divisions,
+                        getattr(mesh_props, 'size', None), getattr(mesh_props, 'origin', None))
@@ -0,0 +1,209 @@
+from typing import Dict, List
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from pyfem.fem.ElementSet import ElementSet
+
+METHODS = ['rcb', 'graph']
+
+
+class Partitioning:
+    """
+    The result of a partitioning of the elements of an ElementSet.
+
+    The partition of each element is stored in one integer array ordered by element row, i.e. by the order in
+    which the elements were added to the ElementSet. The element ids and the interface nodes of each partition are
+    derived from it once.
+    """
+
+    def __init__(self, elements: ElementSet, element_partitions: np.ndarray, number_of_partitions: int) -> None:
+        self.number_of_partitions = number_of_partitions
+        self.element_partitions = element_partitions
+
+        element_ids = elements.ids
+        order = np.argsort(element_partitions, kind='stable')
+        bounds = np.searchsorted(element_partitions[order], np.arange(number_of_partitions + 1))
+
+        # The element ids of each partition, in the order of the element rows
+        self.element_ids: List[np.ndarray] = [element_ids[order[bounds[p]:bounds[p + 1]]]
+                                              for p in range(number_of_partitions)]
+
+        # A node is an interface node if it belongs to elements of more than one partition
+        incidence = elements.get_element_node_incidence()
+        node_rows = incidence.indices
+        node_partitions = np.repeat(element_partitions, np.diff(incidence.indptr))
+        pairs = np.unique(node_rows * number_of_partitions + node_partitions)
+        pair_nodes = pairs // number_of_partitions
+        pair_partitions = pairs % number_of_partitions
+        shared = np.bincount(pair_nodes, minlength=len(elements.nodes)) > 1
+        interface = shared[pair_nodes]
+
+        node_ids = elements.nodes.ids
+        self.interface_nodes: np.ndarray = node_ids[np.flatnonzero(shared)]
+        self.interface_node_ids: List[np.ndarray] = [
+            node_ids[pair_nodes[interface & (pair_partitions == p)]] for p in range(number_of_partitions)]
+
+        sizes = np.bincount(element_partitions, minlength=number_of_partitions)
+
+        coo = elements.get_element_adjacency().tocoo()
+        edge_cut = int(np.count_nonzero(element_partitions[coo.row] != element_partitions[coo.col])) // 2
+
+        self.statistics: Dict[str, float] = {
+            'min_size': int(sizes.min()),
+            'max_size': int(sizes.max()),
+            'imbalance': float(sizes.max() / sizes.mean()),
+            'edge_cut': edge_cut,
+            'interface_nodes': len(self.interface_nodes),
+        }
+        self.sizes = sizes
+
+    def __repr__(self) -> str:
+        str_ = "Number of partitions ....... %6d\n" % self.number_of_partitions
+        str_ += "  Imbalance (max/mean) ....... %6.3f\n" % self.statistics['imbalance']
+        str_ += "  Edge cut ................... %6d\n" % self.statistics['edge_cut']
+        str_ += "  Interface nodes ............ %6d\n" % self.statistics['interface_nodes']
+        str_ += "  -----------------------------------\n"
+        str_ += "    partition      #elems  #interface\n"
+        str_ += "    ---------------------------------\n"
+
+        for p in range(self.number_of_partitions):
+            str_ += "    %9d      %6d      %6d\n" % (p, self.sizes[p], len(self.interface_node_ids[p]))
+
+        return str_
+
+    def get_group_element_indices(self, elements: ElementSet, partition: int) -> Dict[str, np.ndarray]:
+        """
+        Get the positions in their element group of the elements of a partition, which is what the assembly
+        loops over.
+
+        :param elements: the partitioned ElementSet
+        :param partition: the index of the partition
+        :return: a dict with the positions of the elements of the partition for each element group
+        """
+        indices = {}
+        for name, group in elements.groups.items():
+            rows = elements.get_indices_by_ids(group.ids)
+            indices[name] = np.flatnonzero(self.element_partitions[rows] == partition)
+        return indices
+
+
+def partition_elements(elements: ElementSet, number_of_partitions: int, method: str = 'rcb') -> Partitioning:
+    """
+    Partition the elements of an ElementSet.
+
+    :param elements: the ElementSet to partition
+    :param number_of_partitions: the number of partitions
+    :param method: 'rcb' for the recursive coordinate bisection of the element centroids, or 'graph' for the
+        greedy growing of partitions over the element dual graph of ElementSet.get_element_adjacency
+    :raises ValueError: if the method is unknown or if there are more partitions than elements
+    :return: the partitioning
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown partitioning method {method}, the method should be one of {METHODS}")
+
+    if not 0 < number_of_partitions <= len(elements):
+        raise ValueError(f"Cannot partition {len(elements)} elements into {number_of_partitions} partitions")
+
+    if method == 'rcb':
+        element_partitions = recursive_coordinate_bisection(get_element_centroids(elements), number_of_partitions)
+    else:
+        element_partitions = greedy_graph_growing(elements.get_element_adjacency(), number_of_partitions)
+
+    return Partitioning(elements, element_partitions, number_of_partitions)
+
+
+def get_element_centroids(elements: ElementSet) -> np.ndarray:
+    """
+    Get the centroids of all elements, ordered by element row.
+
+    :param elements: the ElementSet
+    :return: the (number_of_elements, rank) array of centroids
+    """
+    coords = elements.nodes.coords
+    centroids = np.empty(shape=(len(elements), coords.shape[1]))
+    for group in elements.groups.values():
+        rows = elements.get_indices_by_ids(group.ids)
+        centroids[rows] = coords[group.get_node_rows(elements.nodes)].mean(axis=1)
+    return centroids
+
+
+def recursive_coordinate_bisection(points: np.ndarray, number_of_partitions: int) -> np.ndarray:
+    """
+    Partition points by recursive coordinate bisection. Every set of points is split along the axis of its
+    largest extent, in the ratio of the numbers of partitions on both sides, so that any number of partitions
+    gives balanced sizes.
+
+    :param points: the (number_of_points, rank) array of points
+    :param number_of_partitions: the number of partitions
+    :return: the partition of each point
+    """
+    partitions = np.zeros(len(points), dtype=int)
+    stack = [(np.arange(len(points)), 0, number_of_partitions)]
+
+    while stack:
+        indices, first, count = stack.pop()
+        if count == 1:
+            partitions[indices] = first
+            continue
+
+        left_count = count // 2
+        split = int(round(len(indices) * left_count / count))
+        sub_points = points[indices]
+        axis = np.argmax(sub_points.max(axis=0) - sub_points.min(axis=0))
+        order = np.argpartition(sub_points[:, axis], split) if 0 < split < len(indices) else np.arange(len(indices))
+
+        stack.append((indices[order[:split]], first, left_count))
+        stack.append((indices[order[split:]], first + left_count, count - left_count))
+
+    return partitions
+
+
+def greedy_graph_growing(graph: csr_matrix, number_of_partitions: int) -> np.ndarray:
+    """
+    Partition the vertices of a graph by greedy graph growing. Each partition is grown breadth-first from the
+    unassigned vertex with the fewest unassigned neighbours, which lies on the boundary of the remaining region,
+    until it holds its share of the remaining vertices. The breadth-first levels are processed as arrays, so the
+    cost is proportional to the number of edges.
+
+    :param graph: the symmetric CSR adjacency matrix
+    :param number_of_partitions: the number of partitions
+    :return: the partition of each vertex
+    """
+    number_of_vertices = graph.shape[0]
+    partitions = np.full(number_of_vertices, -1, dtype=int)
+    indptr, indices = graph.indptr, graph.indices
+    remaining = number_of_vertices
+
+    for p in range(number_of_partitions):
+        target = int(round(remaining / (number_of_partitions - p)))
+        size = 0
+
+        while size < target:
+            unassigned = partitions < 0
+            degrees = graph @ unassigned.astype(float)
+            degrees[~unassigned] = np.inf
+            seed = np.argmin(degrees)[np.newaxis]
+
+            partitions[seed] = p
+            size += 1
+            front = seed
+
+            while size < target and len(front) > 0:
+                front = _unassigned_neighbours(indptr, indices, partitions, front)[:target - size]
+                partitions[front] = p
+                size += len(front)
+
+        remaining -= size
+
+    return partitions
+
+
+def _unassigned_neighbours(indptr: np.ndarray, indices: np.ndarray, partitions: np.ndarray,
+                           vertices: np.ndarray) -> np.ndarray:
+    starts = indptr[vertices]
+    lengths = indptr[vertices + 1] - starts
+    positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    neighbours = np.unique(indices[positions])
+    return neighbours[partitions[neighbours] < 0]
+
@@ -0,0 +1,192 @@
+from itertools import product
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from pyfem.fem.ElementSet import ElementSet
+from pyfem.fem.NodeSet import NodeSet
+from pyfem.utils.logger import get_logger
+
+logger = get_logger()
+
+# The corners of quad4 and hex8 elements in the node order of pyfem.utils.shape_functions
+TENSOR_CORNERS = {
+    'quad4': [(0, 0), (1, 0), (1, 1), (0, 1)],
+    'hex8': [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0), (0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)],
+}
+
+# The new nodes of simplex elements are the midpoints of the edges, given by the local node pairs
+SIMPLEX_EDGES = {
+    'tria3': [(0, 1), (1, 2), (2, 0)],
+    'tetra4': [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)],
+}
+
+# The children of simplex elements in local numbering: the corner nodes first, followed by the edge midpoints
+SIMPLEX_CHILDREN = {
+    'tria3': [(0, 3, 5), (3, 1, 4), (5, 4, 2), (3, 4, 5)],
+    'tetra4': [(0, 4, 5, 6), (4, 1, 7, 8), (5, 7, 2, 9), (6, 8, 9, 3),
+               (4, 9, 5, 6), (4, 9, 6, 8), (4, 9, 8, 7), (4, 9, 7, 5)],
+}
+
+
+def refine_uniformly(nodes: NodeSet, elements: ElementSet, levels: int = 1) -> None:
+    """
+    Refine the quad4, tria3, hex8 and tetra4 elements of a mesh uniformly, in place. Each level splits every element
+    into 4 (2D) or 8 (3D) children.
+
+    The new nodes are placed at the midpoints of the edges, at the centres of the quadrilateral faces and at the
+    centres of the hexahedra. A node on an edge or a face which is shared by several elements is created once: the
+    edges are identified by a hash of their sorted end nodes, and the faces by their sorted nodes. A new node is
+    added to a node group if all the nodes of its edge or face belong to the group, so that boundary groups stay
+    on the refined boundaries. The new nodes and elements are numbered after the existing nodes and from 0 on.
+
+    The mesh of the input file or of the mesh block is refined from the .pro file by
+
+        refine = 2;
+
+    :param nodes: the NodeSet
+    :param elements: the ElementSet of the nodes
+    :param levels: the number of refinements
+    :raises RuntimeError: if the mesh contains other element types
+    """
+    for level in range(levels):
+        logger.info("Refining mesh ................")
+        _refine(nodes, elements)
+
+
+def _get_element_type(nodes_per_element: int, rank: int) -> str:
+    element_types = {(3, 2): 'tria3', (4, 2): 'quad4', (4, 3): 'tetra4', (8, 3): 'hex8'}
+    if (nodes_per_element, rank) not in element_types:
+        raise RuntimeError(f"Cannot refine elements with {nodes_per_element} nodes in {rank}D")
+    return element_types[(nodes_per_element, rank)]
+
+
+def _get_tensor_lattice(element_type: str) -> Tuple[List[List[int]], List[List[int]]]:
+    """
+    The children of quad4 and hex8 elements are the cells of a lattice with 3 points along each axis. Each lattice
+    point is an existing corner, the middle of an edge, the centre of a face or the centre of the element, and is
+    given by the local corners it depends on.
+    """
+    corners = TENSOR_CORNERS[element_type]
+    rank = len(corners[0])
+
+    points = list(product(range(3), repeat=rank))
+    point_corners = []
+    for point in points:
+        options = [[p // 2] if p % 2 == 0 else [0, 1] for p in point]
+        point_corners.append(sorted(corners.index(bits) for bits in product(*options)))
+
+    children = []
+    for offset in product(range(2), repeat=rank):
+        children.append([points.index(tuple(o + b for o, b in zip(offset, bits))) for bits in corners])
+
+    return point_corners, children
+
+
+def _unique_rows(rows: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Number the unique rows of an integer array, the row entries being sorted.
+    """
+    if rows.shape[1] == 2:
+        # The hash of a sorted edge
+        keys = rows[:, 0] * (rows.max(initial=0) + 1) + rows[:, 1]
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        return inverse, len(unique_keys)
+
+    order = np.lexsort(rows.T[::-1])
+    sorted_rows = rows[order]
+    new = np.ones(len(rows), dtype=bool)
+    new[1:] = np.any(sorted_rows[1:] != sorted_rows[:-1], axis=1)
+    inverse = np.empty(len(rows), dtype=int)
+    inverse[order] = np.cumsum(new) - 1
+    return inverse, int(new.sum())
+
+
+def _refine(nodes: NodeSet, elements: ElementSet) -> None:
+    coords = nodes.coords
+    node_ids = nodes.ids
+    number_of_nodes = len(nodes)
+
+    # Collect the entities of all groups which get a new node, grouped by the number of nodes which define them
+    entities: Dict[int, List[np.ndarray]] = {}
+    plans = []
+
+    for name, group in elements.groups.items():
+        element_type = _get_element_type(group.nodes_per_element, nodes.rank)
+        node_rows = group.get_node_rows(nodes)
+
+        if element_type in TENSOR_CORNERS:
+            point_corners, children = _get_tensor_lattice(element_type)
+        else:
+            edges = SIMPLEX_EDGES[element_type]
+            point_corners = [[i] for i in range(group.nodes_per_element)] + [sorted(edge) for edge in edges]
+            children = SIMPLEX_CHILDREN[element_type]
+
+        # Each lattice point is either an existing node or the start of its block in the entities of its size
+        points = []
+        for local in point_corners:
+            size = len(local)
+            if size == 1:
+                points.append((1, node_rows[:, local[0]]))
+            else:
+                blocks = entities.setdefault(size, [])
+                points.append((size, sum(len(block) for block in blocks)))
+                blocks.append(np.sort(node_rows[:, local], axis=1))
+
+        plans.append((name, element_type, points, children, len(node_rows)))
+
+    # Number the new nodes: shared entities are found by their sorted nodes, element centres are all unique
+    new_coords = []
+    new_group_rows = {name: [] for name in nodes.groups}
+    group_masks = {}
+    for name, group_node_ids in nodes.groups.items():
+        mask = np.zeros(number_of_nodes, dtype=bool)
+        mask[nodes.get_indices_by_ids(np.asarray(group_node_ids))] = True
+        group_masks[name] = mask
+
+    entity_rows = {}
+    next_row = number_of_nodes
+    for size in sorted(entities):
+        rows = np.concatenate(entities[size])
+        if size == 2 ** nodes.rank:  # The centres of the elements are not shared
+            inverse, count = np.arange(len(rows)), len(rows)
+        else:
+            inverse, count = _unique_rows(rows)
+
+        first = np.empty(count, dtype=int)
+        first[inverse] = np.arange(len(rows))
+        unique_rows = rows[first]  # The nodes of each new node's edge, face or element
+        new_coords.append(coords[unique_rows].mean(axis=1))
+        for name, mask in group_masks.items():
+            new_group_rows[name].append(next_row + np.flatnonzero(np.all(mask[unique_rows], axis=1)))
+
+        entity_rows[size] = next_row + inverse
+        next_row += count
+
+    # Add the new nodes with ids after the largest existing id
+    first_id = int(node_ids.max()) + 1 if len(node_ids) else 0
+    all_ids = np.concatenate([node_ids, np.arange(first_id, first_id + next_row - number_of_nodes)])
+    nodes.add_items_by_ids(all_ids[number_of_nodes:], np.concatenate(new_coords))
+
+    for name, rows in new_group_rows.items():
+        nodes.groups[name] = np.union1d(nodes.groups[name], all_ids[np.concatenate(rows)])
+
+    # Replace the elements by their children
+    new_elements = []
+    element_id = 0
+    for name, element_type, points, children, count in plans:
+        columns = [value if size == 1 else entity_rows[size][value:value + count] for size, value in points]
+        lattice = np.stack(columns, axis=1)
+        connectivity = lattice[:, children].reshape(-1, len(children[0]))
+
+        if element_type == 'tetra4':
+            x = nodes.coords[connectivity]
+            negative = np.linalg.det(x[:, 1:] - x[:, :1]) < 0
+            connectivity[negative, 1:3] = connectivity[negative, 2:0:-1]
+
+        new_elements.append((name, np.arange(element_id, element_id + len(connectivity)), all_ids[connectivity]))
+        element_id += len(connectivity)
+
+    elements.clear()
+    for name, element_ids, connectivity in new_elements:
+        elements.add_items_by_element_ids(name, element_ids, connectivity)
@@ -0,0 +1,133 @@
+from typing import Tuple, Union
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class SpatialIndex:
+    """
+    A spatial index over a set of points, such as the node coordinates of a NodeSet.
+
+    Two structures are built over the reference coordinates: a uniform grid of buckets, which answers box queries,
+    and a KD-tree (scipy.spatial.cKDTree), which answers radius and nearest queries. Both return candidates which
+    are then checked exactly against the current coordinates.
+
+    The current coordinates are changed by update(), for example to the deformed coordinates coords + state. The
+    structures are only rebuilt when a point has moved more than rebuild_distance from its reference position;
+    otherwise the queries are widened by the largest displacement, so an update costs one pass over the
+    coordinates.
+    """
+
+    def __init__(self, coords: np.ndarray, ids: np.ndarray = None, cell_size: float = None,
+                 rebuild_distance: float = None) -> None:
+        """
+        :param coords: the (number_of_points, rank) array of coordinates
+        :param ids: the ids which the queries return for the points, the row indices by default
+        :param cell_size: the size of the buckets of the grid, chosen for a few points per bucket by default
+        :param rebuild_distance: the displacement from the reference coordinates above which the structures are
+            rebuilt, the cell size by default
+        """
+        self.coords = np.array(coords, dtype=float)
+        self.ids = np.arange(len(self.coords)) if ids is None else np.asarray(ids)
+
+        if cell_size is None:
+            extent = np.ptp(self.coords, axis=0) if len(self.coords) else np.ones(self.coords.shape[1])
+            extent[extent == 0] = max(extent.max(), 1.0)
+            cell_size = (np.prod(extent) * 4.0 / max(len(self.coords), 1)) ** (1.0 / self.coords.shape[1])
+
+        self.cell_size = float(cell_size)
+        self.rebuild_distance = self.cell_size if rebuild_distance is None else float(rebuild_distance)
+
+        self._build()
+
+    def _build(self) -> None:
+        self.reference = self.coords.copy()
+        self.drift = 0.0
+
+        self.tree = cKDTree(self.reference)
+
+        # The buckets are stored as a CSR structure: the points sorted by the linear index of their bucket
+        self.origin = self.reference.min(axis=0) if len(self.reference) else np.zeros(self.reference.shape[1])
+        cells = self._get_cells(self.reference)
+        self.shape = cells.max(axis=0) + 1 if len(cells) else np.ones(self.reference.shape[1], dtype=int)
+        keys = np.ravel_multi_index(cells.T, self.shape)
+        self.order = np.argsort(keys, kind='stable')
+        self.bucket_start = np.searchsorted(keys[self.order], np.arange(np.prod(self.shape) + 1))
+
+    def _get_cells(self, points: np.ndarray) -> np.ndarray:
+        return np.floor((points - self.origin) / self.cell_size).astype(int)
+
+    def update(self, coords: np.ndarray) -> None:
+        """
+        Set the current coordinates of the points.
+
+        :param coords: the (number_of_points, rank) array of current coordinates, e.g. coords + displacements
+        """
+        self.coords = np.array(coords, dtype=float)
+        self.drift = np.sqrt(((self.coords - self.reference) ** 2).sum(axis=1)).max() if len(self.coords) else 0.0
+
+        if self.drift > self.rebuild_distance:
+            self._build()
+
+    def query_radius(self, centre: Union[np.ndarray, list], radius: float) -> np.ndarray:
+        """
+        Get the points within a distance of a centre.
+
+        :param centre: the centre of the sphere
+        :param radius: the radius of the sphere
+        :return: the ids of the points, sorted by row
+        """
+        rows = np.array(self.tree.query_ball_point(centre, radius + self.drift), dtype=int)
+        rows.sort()
+        distances = np.sqrt(((self.coords[rows] - centre) ** 2).sum(axis=1))
+        return self.ids[rows[distances <= radius]]
+
+    def query_box(self, lower: Union[np.ndarray, list], upper: Union[np.ndarray, list]) -> np.ndarray:
+        """
+        Get the points inside an axis-aligned box.
+
+        :param lower: the lowest corner of the box
+        :param upper: the highest corner of the box
+        :return: the ids of the points, sorted by row
+        """
+        lower = np.asarray(lower, dtype=float)
+        upper = np.asarray(upper, dtype=float)
+
+        first = np.maximum(self._get_cells(lower - self.drift), 0)
+        last = np.minimum(self._get_cells(upper + self.drift), self.shape - 1)
+
+        if np.any(last < first):
+            return self.ids[:0]
+
+        cells = np.indices(last - first + 1).reshape(len(first), -1).T + first
+        keys = np.ravel_multi_index(cells.T, self.shape)
+
+        starts = self.bucket_start[keys]
+        lengths = self.bucket_start[keys + 1] - starts
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        rows = np.sort(self.order[positions])
+
+        points = self.coords[rows]
+        inside = np.all((points >= lower) & (points <= upper), axis=1)
+        return self.ids[rows[inside]]
+
+    def query_nearest(self, point: Union[np.ndarray, list], count: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the points nearest to a point.
+
+        :param point: the point
+        :param count: the number of nearest points
+        :return: the ids of the nearest points and their distances, sorted by distance
+        """
+        count = min(count, len(self.coords))
+        _, rows = self.tree.query(point, k=count)
+        rows = np.atleast_1d(rows)
+
+        if self.drift > 0.0:
+            # The nearest points of the reference coordinates bound the distance of the nearest current points
+            bound = np.sqrt(((self.coords[rows] - point) ** 2).sum(axis=1)).max()
+            rows = np.array(self.tree.query_ball_point(point, bound + self.drift), dtype=int)
+
+        distances = np.sqrt(((self.coords[rows] - point) ** 2).sum(axis=1))
+        nearest = np.lexsort((rows, distances))[:count]
+        return self.ids[rows[nearest]], distances[nearest]
@@ -22,13 +22,13 @@ class LinearSolver(BaseModule):
         K, fint = assembleTangentStiffness(props, globdat)
         fext = assembleExternalForce(props, globdat)
 
-        state0 = globdat.state
+        state = globdat.dofs.solve(K, fext)
 
-        globdat.state = globdat.dofs.solve(K, fext)
+        # The global vectors are updated in place, because they may be memory-mapped
+        globdat.dstate[:] = state - globdat.state
+        globdat.state[:] = state
 
-        globdat.dstate = globdat.state - state0
-
-        globdat.fint = assembleInternalForce(props, globdat)
+        globdat.fint[:] = assembleInternalForce(props, globdat)
 
         commit(props, globdat)
 
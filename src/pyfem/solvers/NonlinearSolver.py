@@ -101,6 +101,11 @@ class NonlinearSolver(BaseModule):
 
             logger.info('    Iteration %4i   : %6.4e' % (stat.iiter, error))
 
+            # The number of elements with yielding points, whose stiffness matrices were computed from the tangents
+            active = globdat.elements.get_active_set_size()
+            if active is not None:
+                logger.info('    Active elements  : %i of %i' % active)
+
             globdat.dofs.set_constrain_factor(0.0)
 
             if stat.iiter == self.iterMax:
@@ -112,7 +117,7 @@ class NonlinearSolver(BaseModule):
 
         Da[:] = zeros(globdat.dofs.number_of_dofs)
 
-        globdat.fint = fint
+        globdat.fint[:] = fint
 
         if stat.cycle == self.maxCycle or globdat.lam > self.maxLam:
             globdat.active = False
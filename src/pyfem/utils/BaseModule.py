@@ -1,5 +1,8 @@
 class BaseModule:
 
+    # Output modules write in the cycles which are a multiple of interval
+    interval = 1
+
     def __init__(self, props):
 
         if hasattr(props, 'currentModule') and hasattr(props, props.currentModule):
@@ -15,3 +18,15 @@ class BaseModule:
 
             for name, val in self.myProps:
                 setattr(self, name, val)
+
+    def requiredOutput(self, globdat):
+        """
+        The nodal output fields which an output module writes in the current cycle, see OutputManager.
+
+        :param globdat: the global data
+        :return: None for all fields in the cycles which are a multiple of interval, an empty list in the others
+        """
+        if not globdat.solver_status.cycle % self.interval == 0:
+            return []
+
+        return None
@@ -1,4 +1,6 @@
-from typing import List, Union
+from typing import List, Optional, Union
+
+import numpy as np
 
 
 class IntegerIdDict(dict):
@@ -80,3 +82,127 @@ class IntegerIdDict(dict):
             return indices[index]
         except IndexError:
             raise IndexError("Index out of range")
+
+
+class IntegerIdIndex(IntegerIdDict):
+    """
+    A list-like dictionary which maps unique integer IDs to the row indices of an array-backed storage.
+    dict[id] -> row index
+    Rows are assigned consecutively in the order in which the IDs are added, so that the row index of an ID is
+    equal to its position in list(self.keys()).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._ids: Optional[np.ndarray] = None
+        self._sorted_ids: Optional[np.ndarray] = None
+        self._sorted_rows: Optional[np.ndarray] = None
+
+    @property
+    def ids(self) -> np.ndarray:
+        """
+        The IDs ordered by row index.
+
+        :return: an integer array of IDs
+        """
+
+        if self._ids is None or len(self._ids) != len(self):
+            self._ids = np.fromiter(self.keys(), dtype=int, count=len(self))
+        return self._ids
+
+    def clear(self) -> None:
+        """
+        Remove all IDs.
+        """
+
+        super().clear()
+        self._ids = None
+        self._sorted_ids = None
+        self._sorted_rows = None
+
+    def add_id(self, id_: int) -> int:
+        """
+        Add a single ID and assign it the next row index.
+
+        :param id_: the ID to add
+        :raises ValueError: if the ID already exists in the list
+        :return: the row index of the ID
+        """
+
+        row = len(self)
+        IntegerIdDict.add_item_by_id(self, id_, row)
+        self._sorted_ids = None
+        return row
+
+    def add_ids(self, ids: Union[List[int], np.ndarray]) -> np.ndarray:
+        """
+        Add a block of IDs at once and assign them consecutive row indices.
+
+        :param ids: a list or an array of IDs
+        :raises ValueError: if an ID already exists in the list or appears twice
+        :return: the row indices of the IDs
+        """
+
+        ids = np.asarray(ids, dtype=int).tolist()
+
+        unique_ids = set(ids)
+
+        if len(unique_ids) != len(ids) or not self.keys().isdisjoint(unique_ids):
+            raise ValueError(f"{type(self).__name__} already contains some of the IDs")
+
+        first_row = len(self)
+        rows = np.arange(first_row, first_row + len(ids))
+        self.update(zip(ids, rows.tolist()))
+        self._sorted_ids = None
+        return rows
+
+    def get_indices_by_ids(self, ids: Union[int, List[int], np.ndarray] = None) -> Union[int, List[int], np.ndarray]:
+        """
+        Get the row indices by the ids of the dict. A single ID or a list of IDs is looked up in the dict, an array
+        of IDs (of any shape) is looked up at once with a binary search.
+
+        :param ids: a single ID, a list of IDs or an array of IDs (optional, defaults to all IDs in the list)
+        :raises TypeError: if the argument is not an int, list of ints, array of ints, or None
+        :raises ValueError: if an ID is not found
+        :return: either a single index, a list of indices or an array of indices
+        """
+
+        if ids is None:
+            return list(range(len(self)))
+        elif isinstance(ids, (int, np.integer)):
+            try:
+                return self[ids]
+            except KeyError:
+                raise ValueError(f"ID {ids} not found in {type(self).__name__}")
+        elif isinstance(ids, list):
+            try:
+                return [self[id_] for id_ in ids]
+            except KeyError as e:
+                raise ValueError(f"ID {e.args[0]} not found in {type(self).__name__}")
+        elif isinstance(ids, np.ndarray):
+            if self._sorted_ids is None:
+                order = np.argsort(self.ids, kind='stable')
+                self._sorted_ids = self.ids[order]
+                self._sorted_rows = order
+            positions = np.searchsorted(self._sorted_ids, ids)
+            found = positions < len(self._sorted_ids)
+            found[found] = self._sorted_ids[positions[found]] == ids[found]
+            if not np.all(found):
+                raise ValueError(f"IDs {np.unique(ids[~found]).tolist()} not found in {type(self).__name__}")
+            return self._sorted_rows[positions]
+        else:
+            raise TypeError("Argument to get_indices_by_ids() must be int, list of ints, array of ints, or None")
+
+    def get_id_by_index(self, index: int) -> int:
+        """
+        Get the ID at the specified row index.
+
+        :param index: the row index
+        :raises IndexError: if the index is out of range
+        :return: the ID of the item
+        """
+
+        try:
+            return int(self.ids[index])
+        except IndexError:
+            raise IndexError("Index out of range")
@@ -3,6 +3,7 @@ from typing import Dict, List
 from numpy import zeros
 
 from pyfem.fem.NodeSet import NodeSet
+from pyfem.io.dat_reader import DatFile
 from pyfem.utils.logger import get_logger
 
 logger = get_logger()
@@ -53,15 +54,15 @@ class Properties:
 
     def store(self, key: str, val: object) -> None:
         """
-        store 方法用于动态添加属性和值。如果属性名中包含点号 .，则表示这是一个嵌套属性名，需要在类的 __dict__ 属性中按照层级结构创建一个字典对象，并在最终嵌套层级上设置属性值。
+        store 方法用于动态添加属性和值。如果属性名中包含点号 .，则表示这是一个嵌套属性名，需要在类的 __dict__ 属性中按照层级结构创建 Properties 对象，并在最终嵌套层级上设置属性值。
         如果属性名不包含点号，则直接在类的 __dict__ 属性中添加属性和值。
-        注意，在 store 方法中使用了字典的 setdefault 方法，当属性名不存在时，会创建一个空的字典作为属性值。
+        注意，在 store 方法中使用了字典的 setdefault 方法，当上级属性名不存在时，会创建一个空的 Properties 对象作为属性值，因此嵌套属性也可以用点号访问和迭代。
         """
         if "." in key:
             keys = key.split(".")
             obj = self
             for k in keys[:-1]:
-                obj = obj.__dict__.setdefault(k, {})
+                obj = obj.__dict__.setdefault(k, Properties())
             obj.__dict__[keys[-1]] = clean_variable(val)
         else:
             self.__dict__[key] = clean_variable(val)
@@ -85,35 +86,44 @@ class GlobalData(Properties):
         self.acce = zeros(number_of_dofs)
         self.solver_status = elements.solver_status
         self.outputNames = []
+        self.outputBuffers = {}
+        self.scratch = None
 
     def read_from_file(self, file_name):
+        self.read_from_dat(DatFile(file_name))
 
-        logger.info("Reading external forces ......")
+    def read_from_dat(self, dat):
 
-        fin = open(file_name)
+        logger.info("Reading external forces ......")
 
-        while True:
-            line = fin.readline()
+        for section in dat.get_sections('ExternalForces'):
+            for line in section.body.splitlines():
+                a = line.strip().split(';')
 
-            if line.startswith('<ExternalForces>') == True:
-                while True:
-                    line = fin.readline()
+                if len(a) == 2:
+                    b = a[0].split('=')
 
-                    if line.startswith('</ExternalForces>') == True:
-                        return
+                    if len(b) == 2:
+                        c = b[0].split('[')
 
-                    a = line.strip().split(';')
+                        dof_type = c[0]
+                        node_id = eval(c[1].split(']')[0])
 
-                    if len(a) == 2:
-                        b = a[0].split('=')
+                        self.fhat[self.dofs.get_dof_ids_by_type(node_id, dof_type)] = eval(b[1])
 
-                        if len(b) == 2:
-                            c = b[0].split('[')
+    def to_scratch(self, scratch):
+        """
+        Keep the mesh, the dof table and the global vectors in memory-mapped files of the scratch space. The
+        solvers update the global vectors in place, so they stay memory-mapped during the whole run.
+        """
+        self.scratch = scratch
 
-                            dof_type = c[0]
-                            node_id = eval(c[1].split(']')[0])
+        self.nodes.to_scratch(scratch)
+        self.elements.to_scratch(scratch)
+        self.dofs.to_scratch(scratch)
 
-                            self.fhat[self.dofs.get_dof_ids_by_type(node_id, dof_type)] = eval(b[1])
+        for name in ['state', 'dstate', 'fint', 'fhat', 'velo', 'acce']:
+            setattr(self, name, scratch.array(getattr(self, name)))
 
     def print_nodes(self, file_name: str = None, node_ids: List[int] = None) -> None:
 
@@ -183,6 +193,30 @@ class GlobalData(Properties):
 
         self.outputNames = []
 
+    def add_nodal_output(self, output_name):
+        """
+        Add a nodal output field with zero values and weights. The arrays of a field are allocated once and reused
+        by later output cycles.
+
+        :param output_name: the name of the field
+        :return: the arrays of the values and of the weights of the field
+        """
+        buffers = getattr(self, 'outputBuffers', {})
+        self.outputBuffers = buffers
+
+        if output_name not in buffers or len(buffers[output_name][0]) != len(self.nodes):
+            buffers[output_name] = (zeros(len(self.nodes)), zeros(len(self.nodes)))
+
+        data, weights = buffers[output_name]
+        data.fill(0.0)
+        weights.fill(0.0)
+
+        self.outputNames.append(output_name)
+        setattr(self, output_name, data)
+        setattr(self, output_name + 'Weights', weights)
+
+        return data, weights
+
 
 class ElementData:
 
@@ -201,3 +235,19 @@ class ElementData:
 
     def __str__(self):
         return self.state
+
+
+class ElementGroupData:
+    """
+    The data which a range of elements of a group is evaluated with at once, stacked with the element as the
+    first axis: the element states, and the element stiffness matrices and internal force vectors which the
+    group-level actions of the element kernel compute.
+    """
+
+    def __init__(self, elstate, elDstate):
+        nElm, nDof = elstate.shape
+
+        self.state = elstate
+        self.dstate = elDstate
+        self.stiff = zeros(shape=(nElm, nDof, nDof))
+        self.fint = zeros(shape=(nElm, nDof))
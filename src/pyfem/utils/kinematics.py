@@ -1,5 +1,13 @@
+import numpy as np
 from numpy import zeros
 
+# The non-zero entries of the small strain B-matrix in Voigt notation for each rank: the strain component, the
+# displacement component of the node dof and the direction of the shape function derivative
+B_MATRIX_ENTRIES = {
+    2: [(0, 0, 0), (1, 1, 1), (2, 0, 1), (2, 1, 0)],
+    3: [(0, 0, 0), (1, 1, 1), (2, 2, 2), (3, 1, 2), (3, 2, 1), (4, 0, 2), (4, 2, 0), (5, 0, 1), (5, 1, 0)],
+}
+
 
 class Kinematics:
 
@@ -9,3 +17,40 @@ class Kinematics:
         self.strain = zeros(nStr)
         self.dgdstrain = zeros(nStr)
         self.g = 0.
+
+
+def get_b_matrices(dhdx):
+    """
+    Build the small strain B-matrices of any stack of integration points at once, e.g. of all points of all
+    elements of a group. The derivatives are scattered into the matrices by one advanced-index assignment.
+
+    :param dhdx: the (..., number_of_nodes, rank) array of shape function derivatives
+    :return: the (..., number_of_strains, number_of_nodes * rank) array of B-matrices
+    """
+    number_of_nodes, rank = dhdx.shape[-2:]
+    strains, dofs, directions = np.array(B_MATRIX_ENTRIES[rank]).T
+
+    b = zeros(shape=dhdx.shape[:-2] + (rank * (rank + 1) // 2, number_of_nodes * rank))
+    columns = dofs[:, np.newaxis] + rank * np.arange(number_of_nodes)
+    b[..., strains[:, np.newaxis], columns] = np.swapaxes(dhdx[..., directions], -1, -2)
+
+    return b
+
+
+def get_n_matrices(h, rank):
+    """
+    Build the matrices which interpolate the displacements from the node dofs for any stack of integration
+    points at once.
+
+    :param h: the (..., number_of_nodes) array of shape function values
+    :param rank: the number of displacement components
+    :return: the (..., rank, number_of_nodes * rank) array of N-matrices
+    """
+    number_of_nodes = h.shape[-1]
+
+    n = zeros(shape=h.shape[:-1] + (rank, number_of_nodes * rank))
+    components = np.arange(rank)
+    n[..., components[:, np.newaxis], components[:, np.newaxis] + rank * np.arange(number_of_nodes)] = \
+        h[..., np.newaxis, :]
+
+    return n
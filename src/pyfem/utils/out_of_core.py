@@ -0,0 +1,102 @@
+import tempfile
+from typing import Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+DEFAULT_MEMORY_BUDGET = 64  # Memory budget of the element chunks in MB
+
+
+class ScratchSpace:
+    """
+    Creates arrays which are backed by numpy.memmap files in a scratch directory instead of main memory.
+
+    The files are anonymous temporary files: they are removed by the operating system as soon as the last array
+    which maps them is garbage collected, so the scratch directory never has to be cleaned up.
+
+    The memory budget bounds the size of the temporary arrays which are gathered per chunk of elements during the
+    assembly.
+
+    The out-of-core storage is enabled from the .pro file by
+
+        outOfCore =
+        {
+          scratchDir   = "/scratch/user";
+          memoryBudget = 256;
+        };
+    """
+
+    def __init__(self, directory: Optional[str] = None, memory_budget: float = DEFAULT_MEMORY_BUDGET) -> None:
+        self.directory = directory
+        self.memory_budget = memory_budget
+
+    def empty(self, shape: Union[int, Tuple[int, ...]], dtype: type = float) -> np.memmap:
+        """
+        Create an uninitialized memory-mapped array.
+
+        :param shape: the shape of the array
+        :param dtype: the data type of the array
+        :return: the memory-mapped array
+        """
+        if np.prod(shape) == 0:  # numpy.memmap cannot map an empty file
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(tempfile.TemporaryFile(dir=self.directory), dtype=dtype, mode='w+', shape=shape)
+
+    def zeros(self, shape: Union[int, Tuple[int, ...]], dtype: type = float) -> np.memmap:
+        """
+        Create a memory-mapped array filled with zeros. A new file is filled with zeros by the operating system.
+
+        :param shape: the shape of the array
+        :param dtype: the data type of the array
+        :return: the memory-mapped array
+        """
+        return self.empty(shape, dtype)
+
+    def array(self, a: np.ndarray) -> np.memmap:
+        """
+        Copy an array into a memory-mapped array.
+
+        :param a: the array to copy
+        :return: the memory-mapped array with the same shape, data type and values
+        """
+        a = np.asarray(a)
+        m = self.empty(a.shape, a.dtype)
+        m[...] = a
+        return m
+
+    @classmethod
+    def from_props(cls, props) -> Optional["ScratchSpace"]:
+        """
+        Create the scratch space given by the outOfCore block of the .pro file.
+
+        :param props: the properties of the .pro file
+        :return: the scratch space, or None if the out-of-core storage is not enabled
+        """
+        if not hasattr(props, 'outOfCore'):
+            return None
+
+        out_of_core = props.outOfCore
+        return cls(getattr(out_of_core, 'scratchDir', None),
+                   getattr(out_of_core, 'memoryBudget', DEFAULT_MEMORY_BUDGET))
+
+
+def get_chunk_size(bytes_per_item: int, memory_budget: float = DEFAULT_MEMORY_BUDGET) -> int:
+    """
+    Get the number of items of a chunk which fits in the memory budget.
+
+    :param bytes_per_item: the memory used per item
+    :param memory_budget: the memory budget in MB
+    :return: the number of items per chunk, at least 1
+    """
+    return max(1, int(memory_budget * 1024 * 1024) // max(1, bytes_per_item))
+
+
+def iter_chunks(count: int, chunk_size: int) -> Iterator[slice]:
+    """
+    Iterate over the consecutive chunks of a range of items.
+
+    :param count: the number of items
+    :param chunk_size: the maximum number of items per chunk
+    :return: the slices of the chunks
+    """
+    for start in range(0, count, chunk_size):
+        yield slice(start, min(start + chunk_size, count))
@@ -1,3 +1,4 @@
+from pyfem.io.dat_reader import DatFile
 from pyfem.utils.data_structures import Properties
 
 
@@ -195,74 +196,66 @@ class NodeTable:
 
 
 def read_node_table(file_name, label, nodes=None):
-    fin = open(file_name, 'r')
+    return read_node_tables(DatFile(file_name).get_sections(label), nodes)
 
-    start_label = str('<' + label)
-    end_label = str('</' + label)
 
+def read_node_tables(sections, nodes=None):
     output = []
 
-    for line in fin:
-
-        if line.strip().startswith(start_label):
-
-            nt = NodeTable(label)
-
-            if 'name' in line:
-                sub_label = line.split('=')[1].replace('\n', '').replace('>', '').replace(' ', '').replace('\"',
-                                                                                                           '').replace(
-                    '\'', '')
-                nt.sub_label = sub_label
-
-            for line in fin:
-
-                if line.strip().startswith(end_label):
-                    output.append(nt)
-                    break
-
-                fullRel = line.strip().split(';')
-
-                if len(fullRel) == 2:
-                    splitRel = fullRel[0].split('=')
-
-                    if len(splitRel) == 2:
-                        lhs = splitRel[0]
-                        rhs = splitRel[1]
-
-                        if not is_node_dof(lhs):
-                            raise RuntimeError(str(lhs) + ' is not a NodeDof')
-
-                        dof_type, node_ids = decode_node_dof(lhs, nodes)
-
-                        if get_type(rhs) is float or get_type(rhs) is int:
-                            for node_id in node_ids:
-                                nt.data.append([dof_type, int(node_id), float(eval(rhs))])
-                        else:
-                            rhs = rhs.replace(" ", "").replace("+", " +").replace("-", " -")
-                            splitrhs = rhs.split(" ")
-                            rhs = 0.0
-                            for irhs in splitrhs:
-                                if irhs == "":
-                                    continue
-                                if '[' not in irhs:
-                                    for node_id in node_ids:
-                                        nt.data.append([dof_type, int(node_id), float(eval(irhs))])
-                                else:
-                                    eq_rhs = irhs.split("*")
-                                    factor = 1.0
-
-                                    for ieq_rhs in eq_rhs:
-                                        if (get_type(ieq_rhs) is float) or (get_type(ieq_rhs) is int):
-                                            factor = clean_variable(ieq_rhs)
-                                        else:
-                                            if is_node_dof(ieq_rhs):
-                                                if '-' in ieq_rhs:
-                                                    factor = -1.0;
-                                                ieq_rhs = ieq_rhs.replace("-", "").replace("+", "")
-                                                slave_dof_type, slave_node_id = decode_node_dof(ieq_rhs, nodes)
-
-                                    for node_id in node_ids:
-                                        dt = [dof_type, int(node_id), rhs, slave_dof_type, slave_node_id, factor]
-                                        nt.data.append(dt)
+    for section in sections:
+
+        nt = NodeTable(section.label)
+
+        if section.name is not None:
+            nt.sub_label = section.name
+
+        for line in section.body.splitlines():
+
+            fullRel = line.strip().split(';')
+
+            if len(fullRel) == 2:
+                splitRel = fullRel[0].split('=')
+
+                if len(splitRel) == 2:
+                    lhs = splitRel[0]
+                    rhs = splitRel[1]
+
+                    if not is_node_dof(lhs):
+                        raise RuntimeError(str(lhs) + ' is not a NodeDof')
+
+                    dof_type, node_ids = decode_node_dof(lhs, nodes)
+
+                    if get_type(rhs) is float or get_type(rhs) is int:
+                        for node_id in node_ids:
+                            nt.data.append([dof_type, int(node_id), float(eval(rhs))])
+                    else:
+                        rhs = rhs.replace(" ", "").replace("+", " +").replace("-", " -")
+                        splitrhs = rhs.split(" ")
+                        rhs = 0.0
+                        for irhs in splitrhs:
+                            if irhs == "":
+                                continue
+                            if '[' not in irhs:
+                                for node_id in node_ids:
+                                    nt.data.append([dof_type, int(node_id), float(eval(irhs))])
+                            else:
+                                eq_rhs = irhs.split("*")
+                                factor = 1.0
+
+                                for ieq_rhs in eq_rhs:
+                                    if (get_type(ieq_rhs) is float) or (get_type(ieq_rhs) is int):
+                                        factor = clean_variable(ieq_rhs)
+                                    else:
+                                        if is_node_dof(ieq_rhs):
+                                            if '-' in ieq_rhs:
+                                                factor = -1.0;
+                                            ieq_rhs = ieq_rhs.replace("-", "").replace("+", "")
+                                            slave_dof_type, slave_node_id = decode_node_dof(ieq_rhs, nodes)
+
+                                for node_id in node_ids:
+                                    dt = [dof_type, int(node_id), rhs, slave_dof_type, slave_node_id, factor]
+                                    nt.data.append(dt)
+
+        output.append(nt)
 
     return output
@@ -1,5 +1,6 @@
 from math import sqrt
 
+import numpy as np
 from numpy import dot, empty, zeros, cross
 from scipy.linalg import norm, det, inv
 from scipy.special.orthogonal import p_roots as gauss_scheme
@@ -446,6 +447,22 @@ def get_shape_hex8(xi):
     return shape_data
 
 
+SHAPE_FUNCTIONS = {
+    'line2': get_shape_line2,
+    'line3': get_shape_line3,
+    'tria3': get_shape_tria3,
+    'quad4': get_shape_quad4,
+    'tria6': get_shape_tria6,
+    'quad8': get_shape_quad8,
+    'quad9': get_shape_quad9,
+    'tetra4': get_shape_tetra4,
+    'pyramid5': get_shape_pyramid5,
+    'prism6': get_shape_prism6,
+    'prism18': get_shape_prism18,
+    'hex8': get_shape_hex8,
+}
+
+
 def get_element_type(element_coords):
     num_element_nodes = element_coords.shape[0]
     rank = element_coords.shape[1]
@@ -628,6 +645,59 @@ def get_integration_points(element_type, order, method):
     return xi, weight
 
 
+class ShapeTable:
+    """
+    The shape functions of an element type tabulated at the integration points of the reference element, as
+    stacked arrays:
+
+        xi      (number_of_points, rank) or (number_of_points,) for lines
+        weights (number_of_points,)
+        h       (number_of_points, number_of_nodes)
+        dhdxi   (number_of_points, number_of_nodes, rank)
+
+    The tables do not depend on the element coordinates, so they are computed once per element type, integration
+    order and method by get_shape_table and shared by all elements. The arrays are read-only.
+    """
+
+    def __init__(self, element_type, order=0, method='Gauss'):
+        if element_type not in SHAPE_FUNCTIONS:
+            raise NotImplementedError('Unknown type :' + element_type)
+
+        shape_function = SHAPE_FUNCTIONS[element_type]
+        ip_coords, ip_weights = get_integration_points(element_type, order, method)
+        shape_data = [shape_function(xi) for xi in ip_coords]
+
+        self.element_type = element_type
+        self.xi = np.array(ip_coords, dtype=float)
+        self.weights = np.array(ip_weights, dtype=float)
+        self.h = np.array([data.h for data in shape_data])
+        self.dhdxi = np.array([data.dhdxi for data in shape_data])
+
+        for a in (self.xi, self.weights, self.h, self.dhdxi):
+            a.flags.writeable = False
+
+    def __len__(self):
+        return len(self.weights)
+
+
+_shape_tables = {}
+
+
+def get_shape_table(element_type, order=0, method='Gauss'):
+    """
+    Get the cached shape function table of an element type.
+
+    :param element_type: the element type, e.g. 'quad4'
+    :param order: the integration order relative to the standard order of the element type
+    :param method: the integration method
+    :return: the ShapeTable
+    """
+    key = (element_type, order, method)
+    if key not in _shape_tables:
+        _shape_tables[key] = ShapeTable(element_type, order, method)
+    return _shape_tables[key]
+
+
 def calc_weight_and_derivatives(element_coords, shape_data, weight):
     jac = dot(element_coords.transpose(), shape_data.dhdxi)
 
@@ -658,37 +728,76 @@ def get_element_shape_data(element_coords, order=0, method='Gauss', element_type
     if element_type == 'Default':
         element_type = get_element_type(element_coords)
 
-    (ip_coords, ip_wights) = get_integration_points(element_type, order, method)
+    table = get_shape_table(element_type, order, method)
 
-    for xi, weight in zip(ip_coords, ip_wights):
-        try:
-            shape_data = eval('get_shape_' + element_type + '(xi)')
-        except NotImplementedError:
-            raise NotImplementedError('Unknown type :' + element_type)
+    # Only the Jacobian transform depends on the element, the reference data is shared by all elements of a type
+    jac = np.einsum('nr,ins->irs', element_coords, table.dhdxi)
 
-        calc_weight_and_derivatives(element_coords, shape_data, weight)
+    if jac.shape[1] == jac.shape[2]:
+        dhdx = np.matmul(table.dhdxi, np.linalg.inv(jac))
+        weights = np.abs(np.linalg.det(jac)) * table.weights
+    x = dot(table.h, element_coords)
 
-        shape_data.x = dot(shape_data.h, element_coords)
+    for i in range(len(table)):
+        shape_data = ShapeData()
+        shape_data.xi = table.xi[i]
+        shape_data.h = table.h[i]
+        shape_data.dhdxi = table.dhdxi[i]
+
+        if jac.shape[1] == jac.shape[2]:
+            shape_data.dhdx = dhdx[i]
+            shape_data.weight = weights[i]
+        else:
+            calc_weight_and_derivatives(element_coords, shape_data, table.weights[i])
+
+        shape_data.x = x[i]
 
         element_data.shape_data.append(shape_data)
 
     return element_data
 
 
-def get_shape_data(order=0, method='Gauss', element_type='Default'):
-    shape_data = ElementShapeData()
+def get_stacked_shape_data(element_coords, order=0, method='Gauss', element_type='Default'):
+    """
+    Compute the shape function derivatives and the integration weights of a stack of elements of the same type at
+    once, with batched inverses and determinants of the Jacobians.
 
-    (ip_coords, ip_wights) = get_integration_points(element_type, order, method)
+    :param element_coords: the (number_of_elements, number_of_nodes, rank) array of element coordinates
+    :param order: the integration order relative to the standard order of the element type
+    :param method: the integration method
+    :param element_type: the element type, derived from the coordinates by default
+    :return: the ShapeTable, the (number_of_elements, number_of_points, number_of_nodes, rank) derivatives dhdx
+        and the (number_of_elements, number_of_points) weights
+    """
+    if element_type == 'Default':
+        element_type = get_element_type(element_coords[0])
 
-    for xi, weight in zip(ip_coords, ip_wights):
-        try:
-            shape_data = eval('getShape' + element_type + '(xi)')
-        except NotImplementedError:
-            raise NotImplementedError('Unknown type :' + element_type)
+    table = get_shape_table(element_type, order, method)
 
-        shape_data.dhdx = shape_data.dhdxi
-        shape_data.weight = weight
+    jac = np.einsum('enr,ins->eirs', element_coords, table.dhdxi)
 
-        shape_data.shape_data.append(shape_data)
+    if jac.shape[2] != jac.shape[3]:
+        raise NotImplementedError('Stacked shape data needs elements of the dimension of the space')
 
-    return shape_data
+    dhdx = np.matmul(table.dhdxi, np.linalg.inv(jac))
+    weights = np.abs(np.linalg.det(jac)) * table.weights
+
+    return table, dhdx, weights
+
+
+def get_shape_data(order=0, method='Gauss', element_type='Default'):
+    element_data = ElementShapeData()
+
+    table = get_shape_table(element_type, order, method)
+
+    for i in range(len(table)):
+        shape_data = ShapeData()
+        shape_data.xi = table.xi[i]
+        shape_data.h = table.h[i]
+        shape_data.dhdxi = table.dhdxi[i]
+        shape_data.dhdx = table.dhdxi[i]
+        shape_data.weight = table.weights[i]
+
+        element_data.shape_data.append(shape_data)
+
+    return element_data